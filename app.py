@@ -3,27 +3,104 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
+import time
+import threading
 import streamlit as st
 from datetime import datetime
 from dotenv import load_dotenv
 from orchestration.main_orchestrator import MainOrchestrator
+from utils import async_runtime
+from utils.stream_preview import StreamPreview
 
 load_dotenv()
 
 st.set_page_config(page_title="Autonomous 247 Hub", page_icon="🤖", layout="wide")
 
+_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# --- Each service is its own process-wide resource, shared by every session and rerun ---
+# The orchestrator is handed these factories as providers, so it uses the same instances.
+# Service modules are imported inside their factories so they load only when first needed.
+@st.cache_resource
+def get_kill_switch():
+    return threading.Event()
+
+@st.cache_resource
+def get_web_search_service():
+    from core_services.web_search_service import WebSearchService
+    return WebSearchService()
+
+@st.cache_resource
+def get_content_generator():
+    from core_services.content_generator_service import ContentGeneratorService
+    return ContentGeneratorService(web_search_service=get_web_search_service(), kill_switch=get_kill_switch())
+
+@st.cache_resource
+def get_image_post_generator():
+    from core_services.image_post_generator_service import ImagePostGeneratorService
+    return ImagePostGeneratorService()
+
+@st.cache_resource
+def get_video_producer():
+    from core_services.video_producer_service import VideoProducerService
+    return VideoProducerService(kill_switch=get_kill_switch())
+
+@st.cache_resource
+def get_youtube_service():
+    from platform_services.youtube_service import YouTubeService
+    return YouTubeService(content_generator=get_content_generator(), video_producer=get_video_producer())
+
+@st.cache_resource
+def get_linkedin_service():
+    from platform_services.linkedin_service import LinkedInService
+    return LinkedInService(
+        content_generator_provider=get_content_generator,
+        image_generator_provider=get_video_producer,
+        image_post_generator_provider=get_image_post_generator
+    )
+
+@st.cache_resource
+def get_scheduler():
+    from orchestration.automation_scheduler import AutomationScheduler
+    return AutomationScheduler(youtube_service_provider=get_youtube_service)
+
 @st.cache_resource
 def get_orchestrator():
     print("UI: Initializing MainOrchestrator for the first time...")
-    return MainOrchestrator()
+    return MainOrchestrator(
+        kill_switch=get_kill_switch(),
+        providers={
+            "web_search_service": get_web_search_service,
+            "content_generator": get_content_generator,
+            "image_post_generator": get_image_post_generator,
+            "video_producer": get_video_producer,
+            "youtube_service": get_youtube_service,
+            "linkedin_service": get_linkedin_service,
+            "scheduler": get_scheduler
+        }
+    )
 
-orchestrator = get_orchestrator()
+@st.cache_resource
+def get_running_generations():
+    """Futures of generations still running in any session, which all share one kill switch."""
+    return threading.Lock(), set()
+
+@st.cache_resource
+def warm_up():
+    """Builds every long-lived resource once per server process, before any widget renders."""
+    orchestrator = get_orchestrator()
+    async_runtime.get_executor()
+    return orchestrator
+
+orchestrator = warm_up()
 
 def initialize_session_state():
     defaults = {
         'is_generating': False,
         'current_task_message': "",
-        'last_result': None
+        'last_result': None,
+        'gen_future': None,
+        'gen_preview': None
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -32,19 +109,29 @@ initialize_session_state()
 
 def handle_linkedin_auth():
     auth_code = st.query_params.get("code")
-    if auth_code and not orchestrator.linkedin_service.is_authenticated():
+    future = st.session_state.get('linkedin_auth_future')
+    if future is None:
+        if not auth_code or orchestrator.linkedin_service.is_authenticated():
+            return
+        future = async_runtime.submit(orchestrator.linkedin_service.complete_authentication, auth_code)
+        st.session_state.linkedin_auth_future = future
+
+    if not future.done():
         with st.spinner("Finalizing LinkedIn connection..."):
-            token_response = orchestrator.linkedin_service.exchange_code_for_token(auth_code)
-            if token_response and token_response.get("success"):
-                if orchestrator.linkedin_service.fetch_user_info():
-                    st.success("✅ LinkedIn connected successfully!")
-                    st.query_params.clear()
-                else:
-                    st.error("Authentication succeeded, but failed to fetch user profile.")
-            else:
-                error_msg = token_response.get('message', 'An unknown error occurred.')
-                st.error(f"Connection failed: {error_msg}")
-        st.stop()
+            time.sleep(0.5)
+        st.rerun()
+
+    st.session_state.linkedin_auth_future = None
+    try:
+        auth_result = future.result()
+    except Exception as e:
+        auth_result = {"success": False, "message": f"Connection failed: {e}"}
+    if auth_result.get("success"):
+        st.success(auth_result["message"])
+        st.query_params.clear()
+    else:
+        st.error(auth_result.get("message", "An unknown error occurred."))
+    st.stop()
 
 handle_linkedin_auth()
 
@@ -53,11 +140,57 @@ st.caption("Your AI-Powered Content Automation Co-Pilot")
 st.divider()
 st.header("✨ Manual Content Generation")
 
-if st.session_state.is_generating:
+def start_generation(task_message, fn, show_stream_preview=False, **kwargs):
+    """Submits a generation task to the background pool so the UI thread stays free."""
+    # The preview belongs to this task alone, so other sessions' runs never show up in it.
+    preview = StreamPreview() if show_stream_preview else None
+    if preview is not None:
+        kwargs["preview"] = preview
+    lock, running = get_running_generations()
+    with lock:
+        running.difference_update([future for future in running if future.done()])
+        if running:
+            # Clearing the shared kill switch now would undo a STOP pressed for that task.
+            st.warning("Another generation is still running (possibly in another browser tab). Please wait for it to finish.")
+            return
+        orchestrator.reset_kill_switch()
+        future = async_runtime.submit(fn, **kwargs)
+        running.add(future)
+    st.session_state.is_generating = True
+    st.session_state.current_task_message = task_message
+    st.session_state.gen_preview = preview
+    st.session_state.gen_future = future
+    st.rerun()
+
+@st.fragment(run_every=0.5)
+def generation_status():
+    """Polls the background task in place; only this fragment reruns while it works."""
+    future = st.session_state.gen_future
+    if future is None or future.done():
+        try:
+            st.session_state.last_result = future.result() if future else None
+        except Exception as e:
+            print(f"UI: Background generation task failed: {e}")
+            st.session_state.last_result = {"success": False, "message": "A critical internal error occurred."}
+        st.session_state.gen_future = None
+        st.session_state.gen_preview = None
+        st.session_state.is_generating = False
+        # A full rerun swaps this status view back for the form and shows the result.
+        st.rerun()
+
     st.info(st.session_state.current_task_message)
     if st.button("🛑 STOP GENERATION", use_container_width=True, type="secondary"):
         orchestrator.trigger_kill_switch()
+    if orchestrator.kill_switch.is_set():
         st.warning("Stop signal sent! The process will halt gracefully at the next step...")
+    preview_text = st.session_state.gen_preview.text() if st.session_state.gen_preview else ""
+    if preview_text:
+        with st.expander("📝 Live script preview", expanded=True):
+            st.code(preview_text[-3000:], language="json")
+    st.caption("⏳ Working in the background... This may take several minutes.")
+
+if st.session_state.is_generating:
+    generation_status()
 else:
     content_type = st.selectbox(
         "1. Select a Task:",
@@ -67,45 +200,49 @@ else:
 
     if content_type == "Astrology Daily Posts":
         st.info("This will generate 12 image posts (one for each zodiac sign) based on today's AI data.")
+        force_refresh = st.checkbox("Write new horoscopes (ignore today's saved ones)", key="cb_astro_refresh")
         if st.button("🔮 Generate Today's 12 Astrology Posts", use_container_width=True, type="primary"):
-            st.session_state.is_generating = True
-            st.session_state.current_task_message = "Generating 12 Astrology Posts..."
-            orchestrator.reset_kill_switch()
-            with st.spinner("Generating posts... This may take several minutes."):
-                st.session_state.last_result = orchestrator.generate_all_astrology_posts()
-            
-            st.session_state.is_generating = False
-            st.rerun()
+            start_generation("Generating 12 Astrology Posts...", orchestrator.generate_all_astrology_posts, force_refresh=force_refresh)
     else:
-        niche = st.text_input("2. Enter Niche:", placeholder="e.g., Artificial Intelligence, Health & Wellness", key="ti_niche")
-        topic = st.text_input("3. Enter a Topic:", placeholder="e.g., The Future of Generative AI", key="ti_topic")
-        
-        auto_search = False
-        if content_type == "YouTube Video":
-             auto_search = st.toggle("Enable Autonomous Research", value=True, help="Allows the AI to search the web for context before generating.")
-
-        if st.button(f"🚀 Generate {content_type}", use_container_width=True, type="primary", disabled=(not topic or not niche)):
-            st.session_state.is_generating = True
-            st.session_state.current_task_message = f"Generating {content_type} on '{topic}'..."
-            orchestrator.reset_kill_switch()
-            result = None
-            with st.spinner(st.session_state.current_task_message):
+        with st.form("manual_gen_form", clear_on_submit=False):
+            niche = st.text_input("2. Enter Niche:", placeholder="e.g., Artificial Intelligence, Health & Wellness", key="ti_niche")
+            topic = st.text_input("3. Enter a Topic:", placeholder="e.g., The Future of Generative AI", key="ti_topic")
+            
+            auto_search = False
+            force_refresh = False
+            if content_type == "YouTube Video":
+                 auto_search = st.toggle("Enable Autonomous Research", value=True, help="Allows the AI to search the web for context before generating.")
+            else:
+                force_refresh = st.checkbox("Write a new post (ignore the saved one for this topic)", key="cb_post_refresh")
+
+            submitted = st.form_submit_button(f"🚀 Generate {content_type}", use_container_width=True, type="primary")
+
+        if submitted:
+            if not topic or not niche:
+                st.warning("Please enter both a niche and a topic.")
+            else:
+                task_message = f"Generating {content_type} on '{topic}'..."
                 if content_type == "YouTube Video":
-                    result = orchestrator.generate_single_youtube_video(topic=topic, niche=niche, auto_search_context=auto_search)
+                    start_generation(task_message, orchestrator.generate_single_youtube_video, show_stream_preview=True, topic=topic, niche=niche, auto_search_context=auto_search)
                 elif content_type == "Instagram Post":
-                    result = orchestrator.generate_single_instagram_post(topic=topic, niche=niche)
-                # --- THIS IS THE FIX: Added the missing logic for LinkedIn ---
+                    start_generation(task_message, orchestrator.generate_single_instagram_post, topic=topic, niche=niche, force_refresh=force_refresh)
                 elif content_type == "LinkedIn Post":
-                    result = orchestrator.generate_single_linkedin_post(topic=topic, niche=niche)
+                    start_generation(task_message, orchestrator.generate_single_linkedin_post, topic=topic, niche=niche, force_refresh=force_refresh)
 
-            st.session_state.last_result = result
-            st.session_state.is_generating = False
-            st.rerun()
+@st.fragment
+def caption_box(post):
+    """Each caption is its own fragment, so editing one never re-emits the 12 images around it."""
+    with st.expander("View Caption"):
+        st.text_area("", value=post.caption, height=150, key=f"caption_{post.sign}")
 
-if st.session_state.last_result:
+@st.fragment
+def results_panel(result_data):
+    """
+    Renders the last generation result. As a fragment it keeps its own arguments, so its
+    reruns never rerun the page; each caption box is a nested fragment inside it.
+    """
     st.divider()
     st.header("Generation Results")
-    result_data = st.session_state.last_result
     if isinstance(result_data, list):
         if result_data:
             st.success(f"Successfully generated {len(result_data)} astrology posts!")
@@ -113,11 +250,10 @@ if st.session_state.last_result:
             col_index = 0
             for post in result_data:
                 with cols[col_index]:
-                    st.subheader(post.get('sign', 'Unknown Sign').capitalize())
-                    st.image(post.get('url'), use_column_width=True)
-                    st.link_button("Download Post 📥", post.get('url'))
-                    with st.expander("View Caption"):
-                        st.text_area("", value=post.get('caption', 'No caption available.'), height=150, key=f"caption_{post.get('sign')}")
+                    st.subheader(post.sign.capitalize())
+                    st.image(post.url, use_column_width=True)
+                    st.link_button("Download Post 📥", post.url)
+                    caption_box(post)
                 col_index = (col_index + 1) % 3
         else:
             st.error("Astrology post generation failed or was cancelled.")
@@ -131,54 +267,81 @@ if st.session_state.last_result:
                 st.info(f"Output file is available at: {result_data['path']}")
         else:
             st.error(result_data.get("message", "An unknown error occurred."))
+
+if st.session_state.last_result:
+    results_panel(st.session_state.last_result)
     st.session_state.last_result = None
 
 st.divider()
-with st.expander("⚙️ System Automation & Settings"):
-    st.subheader("System Dashboard")
-    status_data = orchestrator.get_automation_status()
-    stats = status_data.get('stats', {})
-    c1, c2, c3, c4, c5 = st.columns(5)
-    c1.metric("Automation Status", "Running" if status_data.get('is_running') else "Stopped")
-    c2.metric("Videos Generated", stats.get('videos_generated', 0))
-    c3.metric("Videos Uploaded", stats.get('videos_uploaded', 0))
-    c4.metric("Errors", stats.get('errors', 0))
-    next_run = status_data.get('next_run', 'N/A')
-    if next_run != 'N/A' and next_run != "No jobs scheduled":
-        c5.metric("Next Scheduled Run", datetime.fromisoformat(next_run.split('.')[0]).strftime('%a, %H:%M'))
-    else:
-        c5.metric("Next Scheduled Run", next_run)
-
-    st.subheader("Automated Mode (YouTube Only)")
-    col1_auto, col2_auto = st.columns(2)
-    with col1_auto:
-        if st.button("▶️ Start Automation", use_container_width=True):
-            orchestrator.start_automation()
-            st.toast("Automation scheduler started!")
-            st.rerun()
-    with col2_auto:
-        if st.button("⏹️ Stop Automation", use_container_width=True):
-            orchestrator.stop_automation()
-            st.toast("Automation scheduler stopped.")
-            st.rerun()
-
-    st.subheader("Automation Settings")
-    current_settings = orchestrator.scheduler.settings 
-    with st.form("settings_form"):
-        automation_niche = st.text_input("Automation Niche", value=current_settings.get("automation_niche", ""))
-        days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-        selected_days = st.multiselect("Upload Days", options=days, default=current_settings.get("upload_days", []))
-        h, m = map(int, current_settings.get("upload_time", "19:00").split(':'))
-        selected_time = st.time_input("Upload Time (UTC)", value=datetime(2023, 1, 1, h, m).time())
-        if st.form_submit_button("💾 Save Settings"):
-            new_settings = {"automation_niche": automation_niche, "upload_days": selected_days, "upload_time": selected_time.strftime("%H:%M")}
-            orchestrator.update_automation_settings(new_settings)
-            st.toast("Settings saved successfully!")
-            st.rerun()
-
-    st.subheader("🔗 Connect Social Accounts")
-    if orchestrator.linkedin_service.is_authenticated():
-        st.success("✅ Connected to LinkedIn!")
-    else:
-        auth_url = orchestrator.linkedin_service.generate_auth_url()
-        st.link_button("Connect to LinkedIn", auth_url)
\ No newline at end of file
+@st.cache_data(ttl=5.0)
+def _get_status(_orch):
+    """Status reads are reused for a few seconds; the leading underscore skips hashing the orchestrator."""
+    return _orch.get_automation_status()
+
+@st.cache_data(ttl=10.0)
+def _get_settings(_orch):
+    return _orch.scheduler.settings
+
+@st.cache_data
+def _parse_upload_time(upload_time: str):
+    h, m = map(int, upload_time.split(':'))
+    return datetime(2023, 1, 1, h, m).time()
+
+@st.fragment
+def system_panel(orchestrator):
+    """Dashboard and automation settings; button clicks here only rerun this fragment."""
+    with st.expander("⚙️ System Automation & Settings"):
+        st.subheader("System Dashboard")
+        if st.button("🔄 Refresh status"):
+            _get_status.clear()
+        status_data = _get_status(orchestrator)
+        stats = status_data.get('stats', {})
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Automation Status", "Running" if status_data.get('is_running') else "Stopped")
+        c2.metric("Videos Generated", stats.get('videos_generated', 0))
+        c3.metric("Videos Uploaded", stats.get('videos_uploaded', 0))
+        c4.metric("Errors", stats.get('errors', 0))
+        next_run = status_data.get('next_run', 'N/A')
+        if next_run != 'N/A' and next_run != "No jobs scheduled":
+            c5.metric("Next Scheduled Run", datetime.fromisoformat(next_run.split('.')[0]).strftime('%a, %H:%M'))
+        else:
+            c5.metric("Next Scheduled Run", next_run)
+
+        st.subheader("Automated Mode (YouTube Only)")
+        col1_auto, col2_auto = st.columns(2)
+        with col1_auto:
+            if st.button("▶️ Start Automation", use_container_width=True):
+                orchestrator.start_automation()
+                _get_status.clear()
+                st.toast("Automation scheduler started!")
+                st.rerun(scope="fragment")
+        with col2_auto:
+            if st.button("⏹️ Stop Automation", use_container_width=True):
+                orchestrator.stop_automation()
+                _get_status.clear()
+                st.toast("Automation scheduler stopped.")
+                st.rerun(scope="fragment")
+
+        st.subheader("Automation Settings")
+        current_settings = _get_settings(orchestrator)
+        default_time = _parse_upload_time(current_settings.get("upload_time", "19:00"))
+        with st.form("settings_form"):
+            automation_niche = st.text_input("Automation Niche", value=current_settings.get("automation_niche", ""))
+            selected_days = st.multiselect("Upload Days", options=_DAYS, default=current_settings.get("upload_days", []))
+            selected_time = st.time_input("Upload Time (UTC)", value=default_time)
+            if st.form_submit_button("💾 Save Settings"):
+                new_settings = {"automation_niche": automation_niche, "upload_days": selected_days, "upload_time": selected_time.strftime("%H:%M")}
+                orchestrator.update_automation_settings(new_settings)
+                _get_status.clear()
+                _get_settings.clear()
+                st.toast("Settings saved successfully!")
+                st.rerun(scope="fragment")
+
+        st.subheader("🔗 Connect Social Accounts")
+        if orchestrator.linkedin_service.is_authenticated():
+            st.success("✅ Connected to LinkedIn!")
+        else:
+            auth_url = orchestrator.linkedin_service.generate_auth_url()
+            st.link_button("Connect to LinkedIn", auth_url)
+
+system_panel(orchestrator)
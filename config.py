@@ -2,28 +2,85 @@
 # THIS FILE IS SAFE TO COMMIT TO GITHUB
 
 import os
+import functools
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
-# This line loads the variables from your .env file into the environment
-load_dotenv()
-
-# --- Core API Keys (read from environment) ---
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-STABILITY_AI_API_KEY = os.getenv("STABILITY_AI_API_KEY")
-SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
-
-# --- OAuth & Platform Credentials (read from environment) ---
-LINKEDIN_CLIENT_ID = os.getenv("LINKEDIN_CLIENT_ID")
-LINKEDIN_CLIENT_SECRET = os.getenv("LINKEDIN_CLIENT_SECRET")
-# Note: Non-secret variables from the old file are removed for clarity
-# as they were placeholders (e.g., INSTAGRAM_ACCESS_TOKEN)
-
-# --- Asset & Path Configuration ---
-DATA_PATH = os.getenv("DATA_PATH", ".")
-ASSETS_PATH = "assets"
-MUSIC_ASSETS_PATH = os.path.join(ASSETS_PATH, 'music')
-
-# --- OAuth Redirect URI (read from environment) ---
-# Defaults to localhost if not set in the environment
-LINKEDIN_REDIRECT_URI = os.getenv("LINKEDIN_REDIRECT_URI", "http://localhost:8501")
+@dataclass(frozen=True, slots=True)
+class Settings:
+    # --- Core API Keys (read from environment) ---
+    openai_api_key: str | None
+    stability_ai_api_key: str | None
+    serper_api_key: str | None
+    pexels_api_key: str | None
+
+    # --- OAuth & Platform Credentials (read from environment) ---
+    linkedin_client_id: str | None
+    linkedin_client_secret: str | None
+    # Defaults to localhost if not set in the environment
+    linkedin_redirect_uri: str
+
+    # --- DigitalOcean Spaces Storage (read from environment) ---
+    spaces_key: str | None
+    spaces_secret: str | None
+    spaces_name: str | None
+    spaces_region: str | None
+    spaces_endpoint_url: str | None
+
+    # --- Asset & Path Configuration ---
+    data_path: str
+    assets_path: str
+    music_assets_path: str
+    # Where short-lived media (downloads, intermediate images/audio) is written; None means the system temp dir
+    scratch_dir: str | None
+
+    # --- Output Configuration ---
+    # Encoding for rendered social posts: "png" (default), "webp" or "jpeg"
+    post_image_format: str
+
+    # --- LLM Configuration ---
+    # Per-task model overrides, e.g. MODEL_OVERRIDES="video=gpt-4o,astrology=gpt-4o-mini"
+    model_overrides: dict[str, str]
+
+def _parse_model_overrides(raw: str | None) -> dict[str, str]:
+    overrides = {}
+    for pair in (raw or "").split(","):
+        task, sep, model = pair.partition("=")
+        if sep and task.strip() and model.strip():
+            overrides[task.strip()] = model.strip()
+    return overrides
+
+def _default_scratch_dir() -> str | None:
+    """Uses RAM-backed /dev/shm when it has room; containers often cap it at 64 MB."""
+    try:
+        stats = os.statvfs("/dev/shm")
+    except (AttributeError, OSError):
+        return None
+    return "/dev/shm" if stats.f_bavail * stats.f_frsize >= 512 * 1024 * 1024 else None
+
+@functools.lru_cache(maxsize=1)
+def settings() -> Settings:
+    """Loads the .env file and reads the environment exactly once per process."""
+    # This line loads the variables from your .env file into the environment
+    load_dotenv()
+    assets_path = "assets"
+    return Settings(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        stability_ai_api_key=os.getenv("STABILITY_AI_API_KEY"),
+        serper_api_key=os.getenv("SERPER_API_KEY"),
+        pexels_api_key=os.getenv("PEXELS_API_KEY"),
+        linkedin_client_id=os.getenv("LINKEDIN_CLIENT_ID"),
+        linkedin_client_secret=os.getenv("LINKEDIN_CLIENT_SECRET"),
+        linkedin_redirect_uri=os.getenv("LINKEDIN_REDIRECT_URI", "http://localhost:8501"),
+        spaces_key=os.getenv("DO_SPACES_KEY"),
+        spaces_secret=os.getenv("DO_SPACES_SECRET"),
+        spaces_name=os.getenv("DO_SPACES_NAME"),
+        spaces_region=os.getenv("DO_SPACES_REGION"),
+        spaces_endpoint_url=os.getenv("DO_SPACES_ENDPOINT_URL"),
+        data_path=os.getenv("DATA_PATH", "."),
+        assets_path=assets_path,
+        music_assets_path=os.path.join(assets_path, 'music'),
+        scratch_dir=os.getenv("SCRATCH_DIR") or _default_scratch_dir(),
+        post_image_format=os.getenv("POST_IMAGE_FORMAT", "png").lower(),
+        model_overrides=_parse_model_overrides(os.getenv("MODEL_OVERRIDES")),
+    )
@@ -2,129 +2,535 @@
 
 import os
 import json
+import asyncio
+import threading
+from datetime import date
+import orjson
 from typing import TYPE_CHECKING
-from config import OPENAI_API_KEY
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+from config import settings
+from utils.exceptions import InterruptedException
+from utils import async_runtime
+from utils.response_cache import ResponseCache
 
 try:
-    from openai import OpenAI
+    import h2  # noqa: F401 -- enables HTTP/2 support in httpx
+    HTTP2_AVAILABLE = True
 except ImportError:
-    OpenAI = None
+    HTTP2_AVAILABLE = False
+
+try:
+    from json_repair import repair_json
+except ImportError:
+    repair_json = None
 
 if TYPE_CHECKING:
     from core_services.web_search_service import WebSearchService
+    from utils.stream_preview import StreamPreview
+
+# All LLM payloads are decoded with orjson; its JSONDecodeError subclasses json's.
+_loads = orjson.loads
+# orjson has no incremental API, so partial stream buffers still go through raw_decode.
+_JSON_DECODER = json.JSONDecoder()
+
+def _parse_llm_json(json_string: str, finish_reason: str | None = "stop") -> dict:
+    """
+    Decodes an LLM reply, repairing common defects (trailing commas, stray quotes) before giving up.
+    Only replies that finished normally are repaired: "fixing" a reply cut off at the token limit
+    would silently drop its missing tail.
+    """
+    try:
+        return _loads(json_string)
+    except json.JSONDecodeError:
+        if finish_reason != "stop":
+            raise ValueError(f"LLM reply is incomplete (finish_reason={finish_reason!r}); not repairing it.")
+        if not repair_json: raise
+        print("   - 🩹 LLM returned malformed JSON. Attempting repair...")
+        data = _loads(repair_json(json_string))
+        if not isinstance(data, dict):
+            raise ValueError("LLM reply could not be repaired into a JSON object.")
+        return data
+
+LLM_MAX_ATTEMPTS = 5
+
+def _is_transient_llm_error(exc: BaseException) -> bool:
+    """Connection drops, timeouts, 429s and 5xx are worth retrying; bad requests are not."""
+    try:
+        from openai import APIConnectionError, InternalServerError, RateLimitError
+    except ImportError:
+        return False
+    # APITimeoutError is a subclass of APIConnectionError.
+    return isinstance(exc, (APIConnectionError, RateLimitError, InternalServerError))
+
+def _log_llm_retry(retry_state):
+    print(f"   - 🔁 Transient LLM error ({retry_state.outcome.exception()}). "
+          f"Retry {retry_state.attempt_number}/{LLM_MAX_ATTEMPTS - 1} in {retry_state.next_action.sleep:.1f}s...")
+
+# Exponential backoff with full jitter, so parallel callers hitting a rate limit don't retry in lockstep.
+_llm_retry = retry(
+    stop=stop_after_attempt(LLM_MAX_ATTEMPTS),
+    wait=wait_random_exponential(min=1, max=30),
+    retry=retry_if_exception(_is_transient_llm_error),
+    before_sleep=_log_llm_retry,
+    reraise=True,
+)
 
 class ContentGeneratorService:
-    def __init__(self, web_search_service: 'WebSearchService'):
+    # Structured astrology/caption/social JSON doesn't need the flagship model; long-form video scripts do.
+    _DEFAULT_MODEL = "gpt-4o-mini"
+    _TASK_MODELS = {"video": "gpt-4o"}
+    # Output-token caps per task (per sign for batched requests); a truncated reply is retried once with a larger cap.
+    _MAX_TOKENS = {"astrology": 200, "caption": 250, "social": 400, "video": 2500}
+    LENGTH_RETRY_FACTOR = 1.5
+
+    def __init__(self, web_search_service: 'WebSearchService', kill_switch: threading.Event | None = None):
         self.web_search_service = web_search_service
-        if not OPENAI_API_KEY or not OpenAI:
+        self.kill_switch = kill_switch or threading.Event()
+        self.response_cache = ResponseCache(os.path.join(settings().data_path, "llm_response_cache"))
+        # Imported here so that merely importing this module doesn't load the OpenAI SDK.
+        try:
+            import httpx
+            from openai import AsyncOpenAI, OpenAI
+        except ImportError:
+            OpenAI = AsyncOpenAI = None
+
+        self.async_client = None
+        api_key = settings().openai_api_key
+        if not api_key or not OpenAI:
             self.client = None
             print("❌ Critical Error: OPENAI_API_KEY not found or openai library not installed.")
         else:
             try:
-                self.client = OpenAI(api_key=OPENAI_API_KEY)
-                print("✅ OpenAI client configured successfully.")
+                # One pooled, keep-alive transport shared by every thread that calls the LLM.
+                http_client = httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+                )
+                # max_retries=0: retries are handled by _llm_retry, which also honours the kill switch.
+                self.client = OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+                # Async twin for fanning out independent prompts; it lives on the shared background loop.
+                async_http_client = httpx.AsyncClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+                )
+                self.async_client = AsyncOpenAI(api_key=api_key, http_client=async_http_client, max_retries=0)
+                print(f"✅ OpenAI client configured successfully (HTTP/2: {HTTP2_AVAILABLE}).")
             except Exception as e:
                 self.client = None
                 print(f"❌ Critical Error configuring OpenAI client: {e}")
 
-    def _generate_content_with_openai(self, prompt: str, system_message: str = "You are a helpful assistant.") -> str | None:
+    def _log_prompt_cache_usage(self, response):
+        """Reports how much of the prompt OpenAI served from its prefix cache."""
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None) if usage else None
+        cached_tokens = getattr(details, "cached_tokens", None) if details else None
+        if usage and cached_tokens is not None:
+            print(f"   - 🧠 Prompt cache: {cached_tokens}/{usage.prompt_tokens} prompt tokens cached.")
+
+    def _check_kill_switch(self):
+        if self.kill_switch.is_set():
+            raise InterruptedException("LLM call cancelled by user.")
+
+    def _model_for(self, task: str) -> str:
+        """Picks the model for a task; MODEL_OVERRIDES in the environment wins over the defaults."""
+        return settings().model_overrides.get(task) or self._TASK_MODELS.get(task, self._DEFAULT_MODEL)
+
+    @_llm_retry
+    def _create_completion(self, **kwargs):
+        self._check_kill_switch()
+        return self.client.chat.completions.create(**kwargs)
+
+    @_llm_retry
+    async def _acreate_completion(self, **kwargs):
+        self._check_kill_switch()
+        return await self.async_client.chat.completions.create(**kwargs)
+
+    def _token_caps(self, max_tokens: int | None) -> tuple:
+        if not max_tokens: return (None,)
+        return (max_tokens, int(max_tokens * self.LENGTH_RETRY_FACTOR))
+
+    def _cache_key(self, model: str, prompt: str, system_message: str, cache_bucket: str) -> str:
+        return ResponseCache.make_key(model, system_message, prompt, cache_bucket)
+
+    def _generate_content_with_openai(self, prompt: str, system_message: str = "You are a helpful assistant.", bypass_cache: bool = False, cache_bucket: str = "", model: str = _DEFAULT_MODEL, max_tokens: int | None = None) -> str | None:
+        """
+        Returns the model's JSON reply. Identical requests are answered from the
+        response cache; `cache_bucket` further partitions keys (e.g. by day).
+        """
         if not self.client: return None
+        self._check_kill_switch()
+        cache_key = self._cache_key(model, prompt, system_message, cache_bucket)
+        if not bypass_cache:
+            cached = self.response_cache.get(cache_key)
+            if cached:
+                print(f"   - ♻️ Using cached LLM response for prompt: '{prompt[:60]}...'")
+                return cached
         print(f"   - 🤖 Calling LLM with prompt: '{prompt[:60]}...'")
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "system", "content": system_message}, {"role": "user", "content": prompt}],
-                temperature=0.7,
-                response_format={"type": "json_object"}
-            )
-            return response.choices[0].message.content.strip()
+            for token_cap in self._token_caps(max_tokens):
+                response = self._create_completion(
+                    model=model,
+                    messages=[{"role": "system", "content": system_message}, {"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    response_format={"type": "json_object"},
+                    max_tokens=token_cap
+                )
+                self._log_prompt_cache_usage(response)
+                if response.choices[0].finish_reason != "length":
+                    break
+                print(f"   - ⚠️ LLM reply hit the {token_cap}-token cap.")
+            else:
+                print("❌ LLM reply was still truncated after raising the token cap.")
+                return None
+            content = response.choices[0].message.content.strip()
+            self.response_cache.set(cache_key, content)
+            return content
+        except InterruptedException:
+            raise
         except Exception as e:
             print(f"❌ Error during OpenAI API call: {e}")
             return None
 
-    # (Astrology methods remain unchanged)
-    def generate_astrology_data(self, zodiac_sign: str) -> dict | None:
-        # ... (code for this method is correct and remains the same)
-        print(f"   - 🔮 Generating AI astrological data for {zodiac_sign}...")
-        prompt = f"""
-        Generate a fictional but believable daily horoscope for the zodiac sign: {zodiac_sign.capitalize()}.
-        The output MUST be a single, valid JSON object with these exact keys:
-        - "description": A 1-2 sentence inspiring horoscope.
-        - "mood": A single word describing the primary mood.
-        - "lucky_number": A random number between 1 and 100.
-        - "color": A lucky color for the day.
+    async def _agenerate_content_with_openai(self, prompt: str, system_message: str = "You are a helpful assistant.", bypass_cache: bool = False, cache_bucket: str = "", model: str = _DEFAULT_MODEL, max_tokens: int | None = None) -> str | None:
+        """Async twin of _generate_content_with_openai; must run on the async_runtime loop."""
+        if not self.async_client: return None
+        self._check_kill_switch()
+        cache_key = self._cache_key(model, prompt, system_message, cache_bucket)
+        if not bypass_cache:
+            cached = self.response_cache.get(cache_key)
+            if cached:
+                print(f"   - ♻️ Using cached LLM response for prompt: '{prompt[:60]}...'")
+                return cached
+        print(f"   - 🤖 Calling LLM (async) with prompt: '{prompt[:60]}...'")
+        try:
+            for token_cap in self._token_caps(max_tokens):
+                response = await self._acreate_completion(
+                    model=model,
+                    messages=[{"role": "system", "content": system_message}, {"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    response_format={"type": "json_object"},
+                    max_tokens=token_cap
+                )
+                self._log_prompt_cache_usage(response)
+                if response.choices[0].finish_reason != "length":
+                    break
+                print(f"   - ⚠️ LLM reply hit the {token_cap}-token cap.")
+            else:
+                print("❌ LLM reply was still truncated after raising the token cap.")
+                return None
+            content = response.choices[0].message.content.strip()
+            self.response_cache.set(cache_key, content)
+            return content
+        except InterruptedException:
+            raise
+        except Exception as e:
+            print(f"❌ Error during async OpenAI API call: {e}")
+            return None
+
+    def _stream_content_with_openai(self, prompt: str, system_message: str = "You are a helpful assistant.", model: str = _DEFAULT_MODEL, max_tokens: int | None = None):
         """
-        system_msg = "You are a creative, insightful, and positive astrologer."
-        json_string = self._generate_content_with_openai(prompt, system_message=system_msg)
+        Yields (token, finish_reason) pairs as the response arrives instead of waiting for the
+        full completion. finish_reason is None until the final chunk.
+        """
+        if not self.client: return
+        self._check_kill_switch()
+        print(f"   - 🤖 Streaming LLM response for prompt: '{prompt[:60]}...'")
+        stream = self._create_completion(
+            model=model,
+            messages=[{"role": "system", "content": system_message}, {"role": "user", "content": prompt}],
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            max_tokens=max_tokens,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                # Bail out mid-stream and release the HTTP connection as soon as the user stops.
+                self._check_kill_switch()
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or "", chunk.choices[0].finish_reason
+        finally:
+            stream.close()
+
+    def _generate_streamed_content_with_openai(self, prompt: str, system_message: str = "You are a helpful assistant.", on_partial=None, model: str = _DEFAULT_MODEL, max_tokens: int | None = None, preview: 'StreamPreview | None' = None) -> tuple[str | None, str | None]:
+        """
+        Streams the response and returns (text, finish_reason). Tokens are also appended to
+        `preview`, if given, so the caller can show this task's reply while it arrives.
+        `on_partial(buffer)` is called whenever a token closes a JSON array, letting
+        callers act on completed fields before the rest of the reply arrives.
+        """
+        # Local to this call: the service is shared by every session and the scheduler.
+        tokens = []
+        finish_reason = None
+        try:
+            for token, chunk_finish_reason in self._stream_content_with_openai(prompt, system_message, model=model, max_tokens=max_tokens):
+                tokens.append(token)
+                if preview is not None:
+                    preview.append(token)
+                if on_partial and "]" in token:
+                    on_partial("".join(tokens))
+                finish_reason = chunk_finish_reason or finish_reason
+            if finish_reason == "length":
+                print(f"   - ⚠️ Streamed LLM reply hit the {max_tokens}-token cap.")
+            return "".join(tokens).strip() or None, finish_reason
+        except InterruptedException:
+            raise
+        except Exception as e:
+            print(f"❌ Error during streamed OpenAI API call: {e}")
+            return None, None
+
+    # --- Static system prompts ---
+    # Every fixed instruction and JSON schema lives in the system message, and per-call
+    # values (sign, topic, niche, context) go last in the user message. This keeps each
+    # task's request prefix byte-identical, so OpenAI's automatic prompt caching can apply.
+    _ASTROLOGY_SYSTEM_MSG = """Positive, creative astrologer. Write a fictional daily horoscope for the given zodiac sign.
+Reply with one JSON object: {"description": 1-2 inspiring sentences, "mood": one word, "lucky_number": 1-100, "color": lucky color}."""
+
+    _ASTROLOGY_BATCH_SYSTEM_MSG = """Positive, creative astrologer. Write a fictional daily horoscope for each given zodiac sign.
+Reply with one JSON object keyed by the given lowercase signs; each value is {"description": 1-2 inspiring sentences, "mood": one word, "lucky_number": 1-100, "color": lucky color}."""
+
+    # Larger batches start to degrade per-sign quality and risk runaway output length.
+    ASTROLOGY_MAX_BATCH_SIZE = 8
+
+    _ASTROLOGY_CAPTION_SYSTEM_MSG = """Mystical, positive social media manager. Turn the given horoscope into a short Instagram caption.
+Reply with one JSON object: {"caption": string, "hashtags": array}."""
+
+    _ASTROLOGY_CAPTIONS_BATCH_SYSTEM_MSG = """Mystical, positive social media manager. Horoscope data arrives as JSON keyed by sign.
+Turn each into a 2-3 sentence Instagram caption. Reply with one JSON object keyed by the given signs; each value is {"caption": string, "hashtags": array}."""
+
+    _YOUTUBE_SYSTEM_MSG = """Expert YouTube scriptwriter. Create a video package for the given topic and niche, using any context provided.
+Reply with one JSON object with keys in this order: "title", "description", "tags", "image_prompts" (array of strings), "script"."""
+
+    _SOCIAL_SYSTEM_MSG = """Social media expert. Create a post for the given platform, niche and topic.
+Reply with one JSON object: {"post_text": text written on the image, "hashtags": array, "background_image_prompt": visual-only scene or mood description}.
+background_image_prompt MUST NOT ask for any words, letters or text, e.g. "serene minimalist background, calming blue-green gradients, soft focus"."""
+
+    # (Astrology methods remain unchanged)
+    def _astrology_data_prompt(self, zodiac_sign: str) -> str:
+        return f"Zodiac sign: {zodiac_sign.capitalize()}"
+
+    def _parse_astrology_data(self, json_string: str | None, zodiac_sign: str) -> dict | None:
         if not json_string: return None
         try:
-            data = json.loads(json_string)
+            data = _parse_llm_json(json_string)
             data['sign'] = zodiac_sign
             return data
         except Exception as e:
             print(f"   - ❌ Failed to parse astrology data for {zodiac_sign}: {e}")
             return None
 
+    def generate_astrology_data(self, zodiac_sign: str, bypass_cache: bool = False) -> dict | None:
+        print(f"   - 🔮 Generating AI astrological data for {zodiac_sign}...")
+        json_string = self._generate_content_with_openai(self._astrology_data_prompt(zodiac_sign), system_message=self._ASTROLOGY_SYSTEM_MSG, bypass_cache=bypass_cache, cache_bucket=date.today().isoformat(), model=self._model_for("astrology"), max_tokens=self._MAX_TOKENS["astrology"])
+        return self._parse_astrology_data(json_string, zodiac_sign)
+
+    async def agenerate_astrology_data(self, zodiac_sign: str, bypass_cache: bool = False) -> dict | None:
+        print(f"   - 🔮 Generating AI astrological data for {zodiac_sign}...")
+        json_string = await self._agenerate_content_with_openai(self._astrology_data_prompt(zodiac_sign), system_message=self._ASTROLOGY_SYSTEM_MSG, bypass_cache=bypass_cache, cache_bucket=date.today().isoformat(), model=self._model_for("astrology"), max_tokens=self._MAX_TOKENS["astrology"])
+        return self._parse_astrology_data(json_string, zodiac_sign)
+
+    async def agenerate_astrology_data_batch(self, zodiac_signs, bypass_cache: bool = False) -> dict[str, dict]:
+        """Requests several signs' horoscopes in one LLM call and splits the reply by sign."""
+        print(f"   - 🔮 Generating AI astrological data for {', '.join(zodiac_signs)}...")
+        prompt = f"Zodiac signs: {', '.join(zodiac_signs)}"
+        json_string = await self._agenerate_content_with_openai(prompt, system_message=self._ASTROLOGY_BATCH_SYSTEM_MSG, bypass_cache=bypass_cache, cache_bucket=date.today().isoformat(), model=self._model_for("astrology"), max_tokens=self._MAX_TOKENS["astrology"] * len(zodiac_signs))
+        if not json_string: return {}
+        try:
+            batch_data = _parse_llm_json(json_string)
+        except Exception as e:
+            print(f"   - ❌ Failed to parse batched astrology data: {e}")
+            return {}
+        data_by_sign = {}
+        for sign in zodiac_signs:
+            data = batch_data.get(sign)
+            if isinstance(data, dict):
+                data['sign'] = sign
+                data_by_sign[sign] = data
+        return data_by_sign
+
+    async def agenerate_astrology_data_for_signs(self, zodiac_signs, bypass_cache: bool = False) -> dict[str, dict]:
+        """
+        Splits the signs into a few evenly sized batches, requests the batches
+        concurrently, and retries any sign missing from its batch individually.
+        """
+        zodiac_signs = list(zodiac_signs)
+        if not zodiac_signs: return {}
+        batch_count = -(-len(zodiac_signs) // self.ASTROLOGY_MAX_BATCH_SIZE)
+        batch_size = -(-len(zodiac_signs) // batch_count)
+        batches = [zodiac_signs[i:i + batch_size] for i in range(0, len(zodiac_signs), batch_size)]
+
+        data_by_sign = {}
+        results = await asyncio.gather(*(self.agenerate_astrology_data_batch(batch, bypass_cache) for batch in batches), return_exceptions=True)
+        for batch, result in zip(batches, results):
+            if isinstance(result, InterruptedException):
+                raise result
+            if isinstance(result, Exception):
+                print(f"   - ❌ Error generating astrology data for {', '.join(batch)}: {result}")
+            else:
+                data_by_sign.update(result)
+
+        missing = [sign for sign in zodiac_signs if sign not in data_by_sign]
+        if missing:
+            print(f"   - ⚠️ Batch reply was missing {', '.join(missing)}. Requesting individually...")
+            results = await asyncio.gather(*(self.agenerate_astrology_data(sign, bypass_cache) for sign in missing), return_exceptions=True)
+            for sign, result in zip(missing, results):
+                if isinstance(result, InterruptedException):
+                    raise result
+                if isinstance(result, Exception):
+                    print(f"   - ❌ Error generating astrology data for {sign}: {result}")
+                elif result:
+                    data_by_sign[sign] = result
+        return {sign: data_by_sign[sign] for sign in zodiac_signs if sign in data_by_sign}
+
+    def generate_astrology_data_batch(self, zodiac_signs, bypass_cache: bool = False) -> dict[str, dict]:
+        """Blocking wrapper around agenerate_astrology_data_batch."""
+        if not self.async_client: return {}
+        return async_runtime.run_coroutine(self.agenerate_astrology_data_batch(list(zodiac_signs), bypass_cache))
+
+    def generate_astrology_data_for_signs(self, zodiac_signs, bypass_cache: bool = False) -> dict[str, dict]:
+        """Blocking wrapper around agenerate_astrology_data_for_signs for thread-based callers."""
+        if not self.async_client: return {}
+        return async_runtime.run_coroutine(self.agenerate_astrology_data_for_signs(zodiac_signs, bypass_cache))
+
+    def _fallback_astrology_caption(self, astro_data: dict) -> str:
+        return f"{astro_data.get('description')}\n\n#astrology #horoscope #{astro_data.get('sign')}"
+
+    def _format_astrology_caption(self, caption_data: dict, astro_data: dict) -> str:
+        final_caption = caption_data.get('caption', astro_data.get('description'))
+        hashtags_str = " ".join(caption_data.get('hashtags', []))
+        return f"{final_caption}\n\n{hashtags_str}"
+
     def create_astrology_caption(self, astro_data: dict) -> str:
         # ... (code for this method is correct and remains the same)
         print("   - ✍️ Crafting an engaging astrology caption...")
-        prompt = f"""
-        You have this data for {astro_data.get('sign', 'a zodiac sign')}:
-        - Vibe: {astro_data.get('description')}
-        - Mood: {astro_data.get('mood')}
-        - Lucky Color: {astro_data.get('color')}
-        Transform this into a short, beautiful Instagram caption and provide hashtags.
-        The entire output MUST be a single, valid JSON object with keys "caption" and "hashtags".
-        """
-        system_msg = "You are a mystical and positive social media manager."
-        json_string = self._generate_content_with_openai(prompt, system_message=system_msg)
+        prompt = (
+            f"Sign: {astro_data.get('sign', 'a zodiac sign')}\n"
+            f"- Vibe: {astro_data.get('description')}\n"
+            f"- Mood: {astro_data.get('mood')}\n"
+            f"- Lucky Color: {astro_data.get('color')}"
+        )
+        json_string = self._generate_content_with_openai(prompt, system_message=self._ASTROLOGY_CAPTION_SYSTEM_MSG, model=self._model_for("caption"), max_tokens=self._MAX_TOKENS["caption"])
         if not json_string:
-            return f"{astro_data.get('description')}\n\n#astrology #horoscope #{astro_data.get('sign')}"
+            return self._fallback_astrology_caption(astro_data)
         try:
-            data = json.loads(json_string)
-            final_caption = data.get('caption', astro_data.get('description'))
-            hashtags_str = " ".join(data.get('hashtags', []))
-            return f"{final_caption}\n\n{hashtags_str}"
+            data = _parse_llm_json(json_string)
+            return self._format_astrology_caption(data, astro_data)
         except Exception as e:
             print(f"   - ❌ Error generating caption: {e}. Falling back to default.")
-            return f"{astro_data.get('description')}\n\n#astrology #horoscope #{astro_data.get('sign')}"
+            return self._fallback_astrology_caption(astro_data)
+
+    def create_all_astrology_captions(self, raw_data_by_sign: dict, bypass_cache: bool = False) -> dict[str, str]:
+        """
+        Crafts captions for every sign in a single LLM round-trip instead of one
+        call per sign. Signs missing from the response fall back to the default caption.
+        """
+        if not raw_data_by_sign: return {}
+        print(f"   - ✍️ Crafting {len(raw_data_by_sign)} astrology captions in one request...")
+        horoscopes = {
+            sign: {"vibe": data.get('description'), "mood": data.get('mood'), "lucky_color": data.get('color')}
+            for sign, data in raw_data_by_sign.items()
+        }
+        prompt = f"Signs: {', '.join(raw_data_by_sign)}\nHoroscope data: {orjson.dumps(horoscopes).decode()}"
+        json_string = self._generate_content_with_openai(prompt, system_message=self._ASTROLOGY_CAPTIONS_BATCH_SYSTEM_MSG, bypass_cache=bypass_cache, model=self._model_for("caption"), max_tokens=self._MAX_TOKENS["caption"] * len(raw_data_by_sign))
+        captions_data = {}
+        if json_string:
+            try:
+                captions_data = _parse_llm_json(json_string)
+            except Exception as e:
+                print(f"   - ❌ Error generating batched captions: {e}. Falling back to defaults.")
+
+        captions = {}
+        for sign, astro_data in raw_data_by_sign.items():
+            caption_data = captions_data.get(sign)
+            if isinstance(caption_data, dict):
+                captions[sign] = self._format_astrology_caption(caption_data, astro_data)
+            else:
+                captions[sign] = self._fallback_astrology_caption(astro_data)
+        return captions
 
     # (YouTube method remains unchanged)
-    def generate_complete_video_content(self, topic, niche="Technology", auto_search_context=False):
+    @staticmethod
+    def _extract_completed_array(buffer: str, key: str) -> list | None:
+        """Returns the value of `"key": [...]` from a partial JSON document once that array has closed."""
+        key_pos = buffer.find(f'"{key}"')
+        if key_pos == -1: return None
+        colon_pos = buffer.find(":", key_pos)
+        if colon_pos == -1: return None
+        array_start = colon_pos + 1
+        while array_start < len(buffer) and buffer[array_start].isspace():
+            array_start += 1
+        if array_start >= len(buffer) or buffer[array_start] != "[": return None
+        try:
+            value, _ = _JSON_DECODER.raw_decode(buffer, array_start)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, list) else None
+
+    def generate_complete_video_content(self, topic, niche="Technology", auto_search_context=False, on_image_prompts=None, preview: 'StreamPreview | None' = None):
+        """
+        Generates the full video package. If `on_image_prompts` is given, it is called
+        with the image prompts as soon as they finish streaming, while the script is
+        still being written, so image generation can start early. `preview` receives the
+        streamed reply as it arrives.
+        """
         # ... (code for this method is correct and remains the same)
         context = None
         if auto_search_context and self.web_search_service:
             context = self.web_search_service.search_and_extract_context(topic)
             if not context: print("   - ⚠️ Proceeding without web context. Quality may be lower.")
-        prompt = f"You are a YouTube scriptwriter for a '{niche}' channel. Generate a content package for a video on: '{topic}'."
-        if context: prompt += f"\n\nCONTEXT:\n---\n{context[:4000]}\n---"
-        prompt += '\nThe final output MUST be a single, valid JSON object with keys: "title", "description", "tags", "script", "image_prompts".'
-        json_string = self._generate_content_with_openai(prompt, "You are an expert-level YouTube content creator.")
+        prompt_parts = [f"Channel niche: '{niche}'\nVideo topic: '{topic}'"]
+        if context:
+            context_excerpt = context[:4000]
+            prompt_parts.append(f"\n\nCONTEXT:\n---\n{context_excerpt}\n---")
+        prompt = "".join(prompt_parts)
+        on_partial = None
+        if on_image_prompts:
+            delivered = False
+            def on_partial(buffer):
+                nonlocal delivered
+                if delivered: return
+                image_prompts = self._extract_completed_array(buffer, "image_prompts")
+                if image_prompts is not None:
+                    delivered = True
+                    print(f"   - ⚡ Image prompts ready early ({len(image_prompts)}); handing off while the script streams.")
+                    on_image_prompts(image_prompts)
+        json_string, finish_reason = self._generate_streamed_content_with_openai(prompt, self._YOUTUBE_SYSTEM_MSG, on_partial=on_partial, model=self._model_for("video"), max_tokens=self._MAX_TOKENS["video"], preview=preview)
+        if finish_reason == "length":
+            # A cut-off script must never reach production; regenerate it with more room.
+            print("   - ⚠️ Video package was cut off. Regenerating without streaming at a higher token cap...")
+            json_string = self._generate_content_with_openai(
+                prompt, self._YOUTUBE_SYSTEM_MSG, bypass_cache=True, model=self._model_for("video"),
+                max_tokens=int(self._MAX_TOKENS["video"] * self.LENGTH_RETRY_FACTOR)
+            )
+            if not json_string: raise Exception("AI reply was truncated at the token limit.")
+            # Non-streamed replies are only returned once they finished normally.
+            finish_reason = "stop"
         if not json_string: raise Exception("AI service returned an empty response.")
         try:
-            return json.loads(json_string)
-        except json.JSONDecodeError as e:
+            return _parse_llm_json(json_string, finish_reason)
+        except ValueError as e:
+            print(f"   - ⚠️ Could not repair the video package JSON ({e}). Retrying once with a stricter reminder...")
+        json_string = self._generate_content_with_openai(
+            prompt + "\n\nOutput MUST be valid JSON, nothing else.", self._YOUTUBE_SYSTEM_MSG,
+            bypass_cache=True, model=self._model_for("video"), max_tokens=self._MAX_TOKENS["video"]
+        )
+        if not json_string: raise Exception("AI service returned an empty response.")
+        try:
+            return _parse_llm_json(json_string)
+        except ValueError as e:
             raise Exception(f"Failed to parse JSON from AI. Error: {e}")
 
     # --- THIS IS THE CRITICAL CHANGE ---
-    def generate_social_post_content(self, topic: str, niche: str, platform: str) -> dict | None:
+    def generate_social_post_content(self, topic: str, niche: str, platform: str, bypass_cache: bool = False) -> dict | None:
         """
         Generates text content for a social post AND a separate, purely visual prompt
         for a background image.
         """
-        prompt = f"""
-        You are a social media expert for the '{niche}' niche.
-        Generate a content package for a {platform} post on the topic: '{topic}'.
-        The final output MUST be a single, valid JSON object with these exact keys:
-        - "post_text": The main text content for the post. This is the text that will be written ON the image.
-        - "hashtags": An array of relevant hashtags.
-        - "background_image_prompt": A **VISUAL-ONLY** description for a background image. This prompt should describe a scene, mood, or abstract concept. It MUST NOT contain any words, letters, or requests to write text. For example: "A serene, minimalist background with calming blue and green gradients, soft focus".
-        """
-        
-        json_string = self._generate_content_with_openai(prompt, f"You are a social media expert for {platform}.")
+        prompt = f"Platform: {platform}\nNiche: '{niche}'\nTopic: '{topic}'"
+        json_string = self._generate_content_with_openai(prompt, self._SOCIAL_SYSTEM_MSG, bypass_cache=bypass_cache, model=self._model_for("social"), max_tokens=self._MAX_TOKENS["social"])
         if json_string:
             try:
-                return json.loads(json_string)
-            except json.JSONDecodeError:
+                return _parse_llm_json(json_string)
+            except ValueError:
                 return None
         return None
\ No newline at end of file
@@ -1,33 +1,262 @@
 # src/core_services/image_post_generator_service.py
 
+import io
 import os
-import tempfile
-from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-from config import ASSETS_PATH
-from utils import storage_service
+import math
+import functools
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from config import settings
+
+try:
+    import pyvips
+except (ImportError, OSError):
+    # OSError: the Python binding is installed but the libvips shared library is not.
+    pyvips = None
+
+# Black overlay alpha used to darken the background so white text stays legible.
+OVERLAY_ALPHA = 150
+OVERLAY_DARKEN_FACTOR = (255 - OVERLAY_ALPHA) / 255
+# A constant black overlay is just a per-channel scale, so it is applied as a lookup table.
+_DARKEN_LUT = [round(v * OVERLAY_DARKEN_FACTOR) for v in range(256)] * 3
+
+@functools.lru_cache(maxsize=32)
+def _load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Parses a font file once per (path, size); the default-font fallback is cached too."""
+    try:
+        return ImageFont.truetype(font_path, size=size)
+    except IOError:
+        print("   - ⚠️ Warning: Custom font not found. Using default font.")
+        return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=4096)
+def _word_width(font: ImageFont.FreeTypeFont, word: str) -> float:
+    """Memoizes font.getlength; fonts come from _load_font, so the instances are stable keys."""
+    return font.getlength(word)
+
+# format -> (Pillow format, extension, content type, encoder options)
+# PNG uses the fastest zlib level; the platforms recompress uploads anyway.
+POST_IMAGE_ENCODERS = {
+    "png": ("PNG", "png", "image/png", {"compress_level": 1, "optimize": False}),
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 90, "method": 4}),
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 92}),
+}
+
+# Text shaping and encoding hold the GIL, so posts are rendered in worker processes.
+RENDER_MAX_WORKERS = max(2, (os.cpu_count() or 2) - 1)
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+def _get_render_executor() -> ProcessPoolExecutor:
+    """Creates and returns the process pool used to render post images."""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            print(f"   - Starting image render process pool ({RENDER_MAX_WORKERS} workers)...")
+            # spawn: forking a process that already runs Streamlit and HTTP client threads is unsafe.
+            _render_executor = ProcessPoolExecutor(max_workers=RENDER_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _render_executor
+
+def _reset_render_executor(broken: ProcessPoolExecutor):
+    """Shuts down a pool that can no longer run renders, unless another thread already replaced it."""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is broken:
+            _render_executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _wrap_text_by_pixels(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[tuple[str, float]]:
+    """
+    Wraps text to fit a specific pixel width, measuring each distinct word only once per font.
+    Returns (line, width) pairs so the widths don't have to be measured again for centring.
+    """
+    lines = []
+    words = text.split()
+    if not words: return []
+    space_width = _word_width(font, " ")
+    current_line = [words[0]]
+    current_width = _word_width(font, words[0])
+    for word in words[1:]:
+        word_width = _word_width(font, word)
+        if current_width + space_width + word_width <= max_width:
+            current_line.append(word)
+            current_width += space_width + word_width
+        else:
+            lines.append((" ".join(current_line), current_width))
+            current_line = [word]
+            current_width = word_width
+    lines.append((" ".join(current_line), current_width))
+    return lines
+
+def _prepare_base_image_with_vips(base_image_path: str, size: tuple[int, int]) -> Image.Image:
+    """Shrink-on-load, centre-crop and darken in one multithreaded libvips pipeline."""
+    target_width, target_height = size
+    vips_img = pyvips.Image.thumbnail(base_image_path, target_width, height=target_height, crop="centre")
+    vips_img = vips_img.colourspace("srgb")
+    if vips_img.hasalpha():
+        vips_img = vips_img.flatten()
+    vips_img = (vips_img * OVERLAY_DARKEN_FACTOR).cast("uchar")
+    return Image.frombytes("RGB", (vips_img.width, vips_img.height), vips_img.write_to_memory())
+
+def _prepare_base_image_with_pillow(base_image_path: str, size: tuple[int, int]) -> Image.Image:
+    with Image.open(base_image_path) as img:
+        # JPEG shrink-on-load: let the decoder scale by 1/2, 1/4 or 1/8 while still covering
+        # the target, so a multi-megapixel Pexels photo never gets fully decoded. No-op for other formats.
+        cover_scale = max(size[0] / img.width, size[1] / img.height)
+        img.draft("RGB", (math.ceil(img.width * cover_scale), math.ceil(img.height * cover_scale)))
+        # Smart cropping: fit() picks the centred crop box first and resamples straight
+        # into the target size, instead of resizing an oversized copy and then cropping it.
+        img = ImageOps.fit(img, size, method=Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+
+        # Opaque JPEG backgrounds are already RGB; only palette/alpha inputs need converting.
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return img.point(_DARKEN_LUT)
+
+# Each prepared background is ~4 MB, and every render worker holds its own cache.
+PREPARED_BACKGROUND_CACHE_SIZE = 8
+
+@functools.lru_cache(maxsize=PREPARED_BACKGROUND_CACHE_SIZE)
+def _prepared_background(base_image_path: str, mtime_ns: int, file_size: int, size: tuple[int, int]) -> Image.Image:
+    """Crop + overlay is deterministic per file version, so reused backgrounds are prepared once."""
+    return _prepare_base_image(base_image_path, size)
+
+def _prepare_base_image(base_image_path: str, size: tuple[int, int]) -> Image.Image:
+    """Returns the base image cropped to `size` with the dark text-legibility overlay applied."""
+    if pyvips:
+        try:
+            return _prepare_base_image_with_vips(base_image_path, size)
+        except Exception as e:
+            print(f"   - ⚠️ libvips pipeline failed ({e}). Falling back to Pillow.")
+    return _prepare_base_image_with_pillow(base_image_path, size)
+
+@functools.lru_cache(maxsize=256)
+def _render_text_layer(text: str, font_path: str, font_size: int, max_width: int) -> tuple[Image.Image, tuple[int, int, int, int]]:
+    """
+    Wraps and rasterizes a centred text block once into a coverage mask cropped to its ink,
+    returned with its ink bbox relative to the draw origin. Repeated titles are pasted from cache.
+    """
+    font = _load_font(font_path, font_size)
+    lines = _wrap_text_by_pixels(text, font, max_width) or [("", 0)]
+    # Shape the text once: draw onto a canvas sized from cheap metrics, then crop to the ink.
+    # Lines are centred with the widths from wrapping, as multiline_text(align="center")
+    # would, minus its re-splitting and re-measuring of every line.
+    ascent, descent = font.getmetrics() if hasattr(font, "getmetrics") else (font_size, 0)
+    line_spacing = font.getbbox("A")[3] + 15
+    block_width = max(width for _, width in lines)
+    pad = font_size // 2
+    canvas_width = int(block_width) + 2 * pad
+    canvas_height = (len(lines) - 1) * line_spacing + ascent + descent + 2 * pad
+    canvas = Image.new("L", (canvas_width, canvas_height), 0)
+    draw = ImageDraw.Draw(canvas)
+    for i, (line, width) in enumerate(lines):
+        draw.text((pad + (block_width - width) / 2, pad + i * line_spacing), line, font=font, fill=255)
+    ink = canvas.getbbox() or (pad, pad, pad + 1, pad + 1)
+    bbox = (ink[0] - pad, ink[1] - pad, ink[2] - pad, ink[3] - pad)
+    return canvas.crop(ink), bbox
+
+def _render_post(
+    base_image_path: str,
+    text: str,
+    title: str,
+    title_font_size: int,
+    body_font_size: int,
+    image_format: str
+) -> bytes:
+    """Renders and encodes one post. Pure and picklable, so it can run in a worker process."""
+    target_width, target_height = 1080, 1350
+
+    stat = os.stat(base_image_path)
+    # Copy: the cached background must stay clean for the next post drawn on it.
+    img = _prepared_background(base_image_path, stat.st_mtime_ns, stat.st_size, (target_width, target_height)).copy()
+
+    font_path = os.path.join(settings().assets_path, "Fonts", "Arial.ttf")
+
+    # --- CORRECTED: Professional Text Centering & Padding Logic ---
+    side_padding = 100
+    max_text_width = img.width - (2 * side_padding)
+
+    title_layer, title_bbox = _render_text_layer(title, font_path, title_font_size, max_text_width)
+    body_layer, body_bbox = _render_text_layer(text, font_path, body_font_size, max_text_width)
+    title_height = title_bbox[3] - title_bbox[1]
+    body_height = body_bbox[3] - body_bbox[1]
+
+    spacing_between = 50
+    total_block_height = title_height + spacing_between + body_height
+
+    start_y = (img.height - total_block_height) / 2
+
+    # --- THIS IS THE FIX: Manually calculate X for true centering ---
+    title_x = (img.width - title_layer.width) / 2
+    title_y = start_y
+
+    body_x = (img.width - body_layer.width) / 2
+    body_y = start_y + title_height + spacing_between
+
+    # The layers are cropped to their ink, so shift by the bbox origin to match where the text would be drawn.
+    img.paste("white", (int(title_x + title_bbox[0]), int(title_y + title_bbox[1])), title_layer)
+    img.paste("white", (int(body_x + body_bbox[0]), int(body_y + body_bbox[1])), body_layer)
+    # --- End of Corrected Logic ---
+
+    pil_format, _, _, save_options = POST_IMAGE_ENCODERS[image_format]
+    buffer = io.BytesIO()
+    img.save(buffer, pil_format, **save_options)
+    return buffer.getvalue()
+
+# Uploaded posts remembered per process, so re-rendering an unchanged post reuses its URL.
+POST_URL_CACHE_MAX_ENTRIES = 128
 
 class ImagePostGeneratorService:
     def __init__(self):
+        image_format = settings().post_image_format
+        if image_format not in POST_IMAGE_ENCODERS:
+            print(f"   - ⚠️ Unknown POST_IMAGE_FORMAT '{image_format}'. Using PNG.")
+            image_format = "png"
+        self.image_format = image_format
+        self._post_urls: OrderedDict[tuple, str] = OrderedDict()
+        # Astrology renders its signs from many threads at once.
+        self._post_urls_lock = threading.Lock()
         print("✅ Image Post Generator Service initialized.")
 
-    def _wrap_text_by_pixels(self, text: str, font: ImageFont.FreeTypeFont, max_width: int, draw: ImageDraw.ImageDraw) -> str:
-        """Wraps text to fit a specific pixel width."""
-        lines = []
-        words = text.split()
-        if not words: return ""
-        current_line = words[0]
-        for word in words[1:]:
-            test_line = f"{current_line} {word}"
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            line_width = bbox[2] - bbox[0]
-            if line_width <= max_width:
-                current_line = test_line
-            else:
-                lines.append(current_line)
-                current_line = word
-        lines.append(current_line)
-        return "\n".join(lines)
+    def _render(self, *render_args) -> bytes:
+        """
+        Renders in the process pool; falls back to this thread if the pool itself can't run.
+        Errors raised by the render (e.g. a corrupt base image) propagate unchanged.
+        """
+        executor = _get_render_executor()
+        try:
+            future = executor.submit(_render_post, *render_args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # RuntimeError: another thread's render already broke and shut down this pool.
+            return self._render_in_process(executor, e, render_args)
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            return self._render_in_process(executor, e, render_args)
+
+    @staticmethod
+    def _render_in_process(executor: ProcessPoolExecutor, error: Exception, render_args) -> bytes:
+        print(f"   - ⚠️ Image render pool unavailable ({error}). Rendering in-process.")
+        _reset_render_executor(executor)
+        return _render_post(*render_args)
+
+    def _cached_post_url(self, key: tuple) -> str | None:
+        with self._post_urls_lock:
+            url = self._post_urls.get(key)
+            if url:
+                self._post_urls.move_to_end(key)
+            return url
+
+    def _remember_post_url(self, key: tuple, url: str):
+        with self._post_urls_lock:
+            self._post_urls[key] = url
+            self._post_urls.move_to_end(key)
+            while len(self._post_urls) > POST_URL_CACHE_MAX_ENTRIES:
+                self._post_urls.popitem(last=False)
 
     def create_post_image(
         self, 
@@ -37,91 +266,30 @@ class ImagePostGeneratorService:
         title_font_size: int = 120, 
         body_font_size: int = 80
     ) -> str | None:
+        # Imported here so spawned render workers, which re-import this module, don't load boto3.
+        from utils import storage_service
         try:
-            target_width, target_height = 1080, 1350
-            target_aspect = target_width / target_height
-
-            with Image.open(base_image_path) as img:
-                # (Smart Cropping logic remains the same)
-                original_width, original_height = img.size
-                original_aspect = original_width / original_height
-                if original_aspect > target_aspect:
-                    new_height = target_height
-                    new_width = int(original_aspect * new_height)
-                    resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    left = (new_width - target_width) / 2
-                    right = left + target_width
-                    img = resized_img.crop((left, 0, right, new_height))
-                else:
-                    new_width = target_width
-                    new_height = int(new_width / original_aspect)
-                    resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    top = (new_height - target_height) / 2
-                    bottom = top + target_height
-                    img = resized_img.crop((0, top, new_width, bottom))
-
-                img = img.convert("RGBA")
-                overlay = Image.new("RGBA", img.size, (0, 0, 0, 150))
-                img = Image.alpha_composite(img, overlay)
-                draw = ImageDraw.Draw(img)
-
-                try:
-                    font_path = os.path.join(ASSETS_PATH, "Fonts", "Arial.ttf")
-                    title_font = ImageFont.truetype(font_path, size=title_font_size)
-                    body_font = ImageFont.truetype(font_path, size=body_font_size)
-                except IOError:
-                    print("   - ⚠️ Warning: Custom font not found. Using default font.")
-                    title_font = ImageFont.load_default()
-                    body_font = ImageFont.load_default()
-
-                # --- CORRECTED: Professional Text Centering & Padding Logic ---
-                side_padding = 100
-                max_text_width = img.width - (2 * side_padding)
-                
-                wrapped_title = self._wrap_text_by_pixels(title, title_font, max_text_width, draw)
-                wrapped_body = self._wrap_text_by_pixels(text, body_font, max_text_width, draw)
-                
-                title_bbox = draw.multiline_textbbox((0, 0), wrapped_title, font=title_font, align="center", spacing=15)
-                title_height = title_bbox[3] - title_bbox[1]
-                
-                body_bbox = draw.multiline_textbbox((0, 0), wrapped_body, font=body_font, align="center", spacing=15)
-                body_height = body_bbox[3] - body_bbox[1]
-                
-                spacing_between = 50
-                total_block_height = title_height + spacing_between + body_height
-                
-                start_y = (img.height - total_block_height) / 2
-                
-                # --- THIS IS THE FIX: Manually calculate X for true centering ---
-                title_width = title_bbox[2] - title_bbox[0]
-                title_x = (img.width - title_width) / 2
-                title_y = start_y
-                
-                body_width = body_bbox[2] - body_bbox[0]
-                body_x = (img.width - body_width) / 2
-                body_y = start_y + title_height + spacing_between
-                
-                # --- THE FIX: Removed the unsupported 'anchor' argument ---
-                draw.multiline_text((title_x, title_y), wrapped_title, font=title_font, fill="white", align="center", spacing=15)
-                draw.multiline_text((body_x, body_y), wrapped_body, font=body_font, fill="white", align="center", spacing=15)
-                # --- End of Corrected Logic ---
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-                    img.save(temp_file.name, "PNG")
-                    local_path = temp_file.name
-
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                object_name = f"generated_posts/post_{title.replace(' ','_')}_{timestamp}.png"
-                spaces_url = storage_service.upload_file(local_path, object_name)
-
-                os.remove(local_path) 
-
-                if spaces_url:
-                    print(f"✅ Post image created and uploaded to Spaces.")
-                    return spaces_url
-                else:
-                    raise Exception("File upload to Spaces failed.")
-        
+            # Same file version and text means the same pixels, so a retry or preview skips the render and upload.
+            stat = os.stat(base_image_path)
+            cache_key = (os.path.abspath(base_image_path), stat.st_mtime_ns, stat.st_size, text, title, title_font_size, body_font_size, self.image_format)
+            cached_url = self._cached_post_url(cache_key)
+            if cached_url:
+                print("   - ♻️ Reusing the already uploaded post image.")
+                return cached_url
+
+            image_bytes = self._render(base_image_path, text, title, title_font_size, body_font_size, self.image_format)
+
+            _, extension, content_type, _ = POST_IMAGE_ENCODERS[self.image_format]
+            object_name = storage_service.unique_object_name("generated_posts", f"post_{title.replace(' ','_')}", extension)
+            spaces_url = storage_service.upload_bytes(image_bytes, object_name, content_type=content_type)
+
+            if spaces_url:
+                self._remember_post_url(cache_key, spaces_url)
+                print(f"✅ Post image created and uploaded to Spaces.")
+                return spaces_url
+            else:
+                raise Exception("File upload to Spaces failed.")
+    
         except Exception as e:
             print(f"❌ Error creating post image: {e}")
-            return None
\ No newline at end of file
+            return None
@@ -2,16 +2,13 @@
 
 import os
 import random
-import io
-import re
 import requests
 import tempfile
-from datetime import datetime
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 from moviepy.editor import *
 from moviepy.audio.fx.all import audio_loop
 
-from config import STABILITY_AI_API_KEY, ASSETS_PATH, MUSIC_ASSETS_PATH
+from config import settings
 from utils.exceptions import InterruptedException
 from utils import storage_service
 
@@ -20,13 +17,21 @@ try:
 except ImportError:
     gTTS = None
 
+# Fixed style wrapper around every Stability prompt, formatted once per image.
+STABILITY_PROMPT_TEMPLATE = "concept art for a youtube video, {prompt}, cinematic, ultra realistic, 8k"
+# Images requested from Stability at once; each takes several seconds, almost all of it waiting.
+STABILITY_MAX_CONCURRENCY = 4
+
 class VideoProducerService:
     def __init__(self, kill_switch):
         self.kill_switch = kill_switch
         self.fps = 24
 
-        self.stability_api_key = STABILITY_AI_API_KEY
+        self.stability_api_key = settings().stability_ai_api_key
         self.stability_api_url = "https://api.stability.ai/v2beta/stable-image/generate/ultra"
+        self.stability_headers = {"authorization": f"Bearer {self.stability_api_key}", "accept": "image/*"}
+        # Keep-alive connections shared by all images of a video, instead of a TLS handshake per prompt.
+        self.http_session = requests.Session()
         if not self.stability_api_key or "sk-" not in self.stability_api_key:
             print("⚠️  Warning: STABILITY_AI_API_KEY not found or invalid.")
         else:
@@ -39,40 +44,53 @@ class VideoProducerService:
 
         print("✅ Video Producer Service initialized.")
 
+    def _generate_image_with_stability(self, index, prompt, aspect_ratio):
+        if self.kill_switch.is_set(): raise InterruptedException("AI Image generation cancelled.")
+
+        full_prompt = STABILITY_PROMPT_TEMPLATE.format(prompt=prompt)
+        print(f"   - Prompting: '{prompt[:50]}...'")
+        try:
+            files = {"prompt": (None, full_prompt), "output_format": (None, "png"), "aspect_ratio": (None, aspect_ratio)}
+            response = self.http_session.post(self.stability_api_url, headers=self.stability_headers, files=files, timeout=30)
+            response.raise_for_status()
+
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".png", dir=settings().scratch_dir) as temp_file:
+                temp_file.write(response.content)
+                local_path = temp_file.name
+            
+            object_name = storage_service.unique_object_name("generated_images", f"image_{index}", "png")
+            storage_service.upload_bytes(response.content, object_name, content_type="image/png")
+            
+            print(f"   🖼️  Image generated, saved locally to {local_path}, and uploaded to Spaces.")
+            return local_path
+
+        except Exception as e:
+            print(f"   - ❌ Error generating image: {e}")
+            return None
+
     def _generate_images_with_stability(self, prompts, aspect_ratio="16:9"):
         if not self.stability_api_key:
             print("ℹ️ AI generation skipped: API key not configured.")
             return []
+        if not prompts:
+            return []
 
-        local_image_paths = []
         print(f"🤖 Generating {len(prompts)} image(s) from Stability AI...")
-        for i, prompt in enumerate(prompts):
-            if self.kill_switch.is_set(): raise InterruptedException("AI Image generation cancelled.")
-            
-            full_prompt = f"concept art for a youtube video, {prompt}, cinematic, ultra realistic, 8k"
-            print(f"   - Prompting: '{prompt[:50]}...'")
+        # The prompts are independent, so a video's images take about as long as the slowest one.
+        with ThreadPoolExecutor(max_workers=min(STABILITY_MAX_CONCURRENCY, len(prompts)), thread_name_prefix="stability") as executor:
+            futures = [executor.submit(self._generate_image_with_stability, i, prompt, aspect_ratio) for i, prompt in enumerate(prompts)]
             try:
-                headers = {"authorization": f"Bearer {self.stability_api_key}", "accept": "image/*"}
-                files = {"prompt": (None, full_prompt), "output_format": (None, "png"), "aspect_ratio": (None, aspect_ratio)}
-                response = requests.post(self.stability_api_url, headers=headers, files=files, timeout=30)
-                response.raise_for_status()
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-                    temp_file.write(response.content)
-                    local_path = temp_file.name
-                
-                object_name = f"generated_images/image_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{i}.png"
-                storage_service.upload_file(local_path, object_name)
-                
-                local_image_paths.append(local_path)
-                print(f"   🖼️  Image generated, saved locally to {local_path}, and uploaded to Spaces.")
-
-            except Exception as e:
-                print(f"   - ❌ Error generating image: {e}")
-        return local_image_paths
-
-    def produce_complete_video(self, content, voice_type="female_voice", aspect_ratio="16:9", image_source="ai_generated"):
-        local_temp_files = [] 
+                # Collected in prompt order, so images still line up with the script.
+                local_image_paths = [future.result() for future in futures]
+            except InterruptedException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return [path for path in local_image_paths if path]
+
+    def produce_complete_video(self, content, voice_type="female_voice", aspect_ratio="16:9", image_source="ai_generated", image_paths=None):
+        """Renders the video. Pass `image_paths` when the images were already generated upstream."""
+        local_temp_files = list(image_paths or [])
         try:
             if self.kill_switch.is_set(): raise InterruptedException("Operation cancelled before start.")
             
@@ -89,9 +107,10 @@ class VideoProducerService:
             
             main_audio = AudioFileClip(audio_file_path)
             
-            image_prompts = content.get('image_prompts', [])
-            image_paths = self._generate_images_with_stability(image_prompts, aspect_ratio)
-            local_temp_files.extend(image_paths)
+            if image_paths is None:
+                image_prompts = content.get('image_prompts', [])
+                image_paths = self._generate_images_with_stability(image_prompts, aspect_ratio)
+                local_temp_files.extend(image_paths)
 
             intro = self._create_intro_clip(duration=3, resolution=target_resolution)
             
@@ -104,13 +123,14 @@ class VideoProducerService:
             final_video = concatenate_videoclips([intro, final_content_video, outro])
             final_video_with_music = self._add_background_music(final_video)
             
+            # The rendered video can be hundreds of MB, so it stays in the disk-backed temp dir.
             with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_file:
                 output_filepath = temp_file.name
 
             print(f"💾 Rendering final video to temporary path: {output_filepath}")
             final_video_with_music.write_videofile(output_filepath, fps=self.fps, codec='libx264', audio_codec='aac', threads=4)
             
-            object_name = f"generated_videos/video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+            object_name = storage_service.unique_object_name("generated_videos", "video", "mp4")
             storage_service.upload_file(output_filepath, object_name)
 
             return output_filepath 
@@ -133,11 +153,11 @@ class VideoProducerService:
         try:
             if gTTS:
                 tts = gTTS(text=cleaned_script, lang='en', slow=False)
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3", dir=settings().scratch_dir) as temp_file:
                     filepath = temp_file.name
                     tts.save(filepath)
 
-                object_name = f"generated_audio/audio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3"
+                object_name = storage_service.unique_object_name("generated_audio", "audio", "mp3")
                 storage_service.upload_file(filepath, object_name)
 
                 print(f"   🔊 Audio generated, saved locally to {filepath}, and uploaded to Spaces.")
@@ -150,7 +170,7 @@ class VideoProducerService:
             return None
             
     def _create_intro_clip(self, duration, resolution):
-        logo_path = os.path.join(ASSETS_PATH, "visual_identity/intro_logo.png")
+        logo_path = os.path.join(settings().assets_path, "visual_identity/intro_logo.png")
         background = ColorClip(size=resolution, color=(13, 17, 23), duration=duration)
         if os.path.exists(logo_path):
             logo = ImageClip(logo_path).set_duration(duration).resize(height=int(resolution[1] * 0.2)).set_position('center')
@@ -158,7 +178,7 @@ class VideoProducerService:
         return background
 
     def _create_outro_clip(self, duration, resolution):
-        outro_path = os.path.join(ASSETS_PATH, "visual_identity/outro_card.png")
+        outro_path = os.path.join(settings().assets_path, "visual_identity/outro_card.png")
         if os.path.exists(outro_path):
             return ImageClip(outro_path).set_duration(duration).resize(resolution)
         return ColorClip(size=resolution, color=(13, 17, 23), duration=duration)
@@ -180,7 +200,8 @@ class VideoProducerService:
 
     def _add_background_music(self, video_clip, music_volume=0.1):
         try:
-            music_files = [os.path.join(MUSIC_ASSETS_PATH, f) for f in os.listdir(MUSIC_ASSETS_PATH) if f.lower().endswith(('.mp3', '.wav'))]
+            music_dir = settings().music_assets_path
+            music_files = [os.path.join(music_dir, f) for f in os.listdir(music_dir) if f.lower().endswith(('.mp3', '.wav'))]
             if not music_files: return video_clip
             music_path = random.choice(music_files)
             music = AudioFileClip(music_path).volumex(music_volume)
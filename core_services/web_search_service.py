@@ -2,7 +2,9 @@
 
 import requests
 import json
-from config import SERPER_API_KEY
+import threading
+import time
+from config import settings
 from utils.web_utils import browse_url
 
 class WebSearchService:
@@ -10,8 +12,15 @@ class WebSearchService:
     A service responsible for performing web searches using the Serper API
     and extracting content from the most relevant URL.
     """
+    CONTEXT_CACHE_TTL_SECONDS = 3600
+    CONTEXT_CACHE_MAX_ENTRIES = 128
+
     def __init__(self):
-        if not SERPER_API_KEY or "YOUR_SERPER_API_KEY" in SERPER_API_KEY:
+        # topic -> (fetched_at, context); only successful extractions are cached.
+        self._context_cache: dict[str, tuple[float, str]] = {}
+        self._cache_lock = threading.Lock()
+        self.api_key = settings().serper_api_key
+        if not self.api_key or "YOUR_SERPER_API_KEY" in self.api_key:
             print("❌ Critical Error: SERPER_API_KEY not found or is a placeholder.")
             self.is_configured = False
         else:
@@ -21,16 +30,33 @@ class WebSearchService:
     def search_and_extract_context(self, topic: str) -> str | None:
         """
         Searches a topic, finds the best URL from the results, and browses it
-        to extract clean text content.
+        to extract clean text content. Results are reused for an hour per topic.
         """
         if not self.is_configured:
             print("   - ❗ Web Search is not configured. Skipping context search.")
             return None
 
+        cache_key = topic.strip().lower()
+        with self._cache_lock:
+            cached = self._context_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self.CONTEXT_CACHE_TTL_SECONDS:
+            print(f"   - ♻️ Reusing cached research for: '{topic}'")
+            return cached[1]
+
+        context_text = self._search_and_extract_context(topic)
+        if context_text:
+            with self._cache_lock:
+                if len(self._context_cache) >= self.CONTEXT_CACHE_MAX_ENTRIES:
+                    self._context_cache.pop(next(iter(self._context_cache)))
+                self._context_cache[cache_key] = (time.monotonic(), context_text)
+        return context_text
+
+    def _search_and_extract_context(self, topic: str) -> str | None:
+
         print(f"🧠 Conducting autonomous research for: '{topic}'...")
         try:
             payload = json.dumps({"q": topic})
-            headers = {'X-API-KEY': SERPER_API_KEY, 'Content-Type': 'application/json'}
+            headers = {'X-API-KEY': self.api_key, 'Content-Type': 'application/json'}
             response = requests.post("https://google.serper.dev/search", headers=headers, data=payload, timeout=10)
             response.raise_for_status()
             search_results = response.json()
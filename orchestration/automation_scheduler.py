@@ -6,9 +6,14 @@ import json
 import os
 import logging
 import threading
-from config import DATA_PATH
+from typing import TYPE_CHECKING, Callable
+from config import settings
 
+if TYPE_CHECKING:
+    from platform_services.youtube_service import YouTubeService
 
+
+DATA_PATH = settings().data_path
 LOG_FILE = os.path.join(DATA_PATH, 'automation.log')
 
 
@@ -23,8 +28,11 @@ class AutomationScheduler:
     Manages the background scheduling of automated tasks. It maintains its state
     (settings and stats) in JSON files within the persistent data directory.
     """
-    def __init__(self, youtube_service):
-        self.youtube_service = youtube_service
+    def __init__(self, youtube_service_provider: Callable[[], 'YouTubeService']):
+        # Resolved on the first automation cycle, so showing the status panel doesn't
+        # import moviepy and the Google API client.
+        self._youtube_service_provider = youtube_service_provider
+        self._youtube_service = None
         
         self.settings_file = os.path.join(DATA_PATH, 'automation_settings.json')
         self.stats_file = os.path.join(DATA_PATH, 'automation_stats.json')
@@ -37,6 +45,12 @@ class AutomationScheduler:
         
         print("✅ Automation Scheduler initialized.")
 
+    @property
+    def youtube_service(self) -> 'YouTubeService':
+        if self._youtube_service is None:
+            self._youtube_service = self._youtube_service_provider()
+        return self._youtube_service
+
     def run_single_automation_cycle(self):
         """Executes one full cycle of the automated task."""
         logging.info("🚀 Starting new automation cycle...")
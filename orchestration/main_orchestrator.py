@@ -1,50 +1,137 @@
 # orchestration/main_orchestrator.py
+import copy
+import functools
 import threading
+from typing import Callable
 from utils.exceptions import InterruptedException
+from utils.log import get_logger
 
-from core_services.content_generator_service import ContentGeneratorService
-from core_services.video_producer_service import VideoProducerService
-from core_services.web_search_service import WebSearchService
-from core_services.image_post_generator_service import ImagePostGeneratorService
-from platform_services.youtube_service import YouTubeService
-from platform_services.linkedin_service import LinkedInService
-from platform_services.astrology_service import AstrologyService
-from platform_services.instagram_service import InstagramService
-from orchestration.automation_scheduler import AutomationScheduler
+logger = get_logger("orchestrator")
+
+_CANCELLED = {"success": False, "message": "Operation Cancelled by User."}
+_FAILED = {"success": False, "message": "A critical internal error occurred."}
+
+def _orchestrator_entry(operation: str, cancelled=_CANCELLED, failed=_FAILED):
+    """
+    Wraps a UI-facing entry point: clears the kill switch, then turns a cancellation
+    or an unexpected error into the given result instead of raising into the caller.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            self.reset_kill_switch()
+            try:
+                return fn(self, *args, **kwargs)
+            except InterruptedException:
+                return copy.copy(cancelled)
+            except Exception:
+                logger.exception("ORCHESTRATOR: Critical error during %s.", operation)
+                return copy.copy(failed)
+        return wrapper
+    return decorator
 
 class MainOrchestrator:
-    def __init__(self):
+    """
+    Wires all services together. Each service (and its heavy module import) is built
+    on first access. A provider callable may be supplied per service name (e.g. a
+    UI-level resource cache) to be used instead of the default constructor.
+    """
+    def __init__(self, kill_switch: threading.Event | None = None, providers: dict[str, Callable[[], object]] | None = None):
         print("Initializing the Main Orchestrator...")
         
-        self.kill_switch = threading.Event()
+        self.kill_switch = kill_switch or threading.Event()
+        self._providers = providers or {}
+        self._services = {}
+        # Re-entrant because building one service pulls in its dependencies.
+        self._services_lock = threading.RLock()
+        print("✅ Main Orchestrator initialized. Services will be created on first use.")
 
-        # --- Initialize Core Services ---
-        self.web_search_service = WebSearchService()
-        self.video_producer = VideoProducerService(kill_switch=self.kill_switch)
-        self.image_post_generator = ImagePostGeneratorService()
-        self.content_generator = ContentGeneratorService(web_search_service=self.web_search_service)
-        
-        # --- Initialize Platform Services ---
-        self.youtube_service = YouTubeService(
-            content_generator=self.content_generator, video_producer=self.video_producer
-        )
-        self.linkedin_service = LinkedInService(
-            content_generator=self.content_generator, 
-            image_generator=self.video_producer,
-            image_post_generator=self.image_post_generator
-        )
-        self.astrology_service = AstrologyService(
-            content_generator=self.content_generator, image_post_generator=self.image_post_generator
-        )
-        self.instagram_service = InstagramService(
-            content_generator=self.content_generator, 
-            image_generator=self.video_producer,
-            image_post_generator=self.image_post_generator
-        )
-        
-        # --- Initialize the Automation Scheduler ---
-        self.scheduler = AutomationScheduler(youtube_service=self.youtube_service)
-        print("✅ Main Orchestrator and all services initialized.")
+    def _get_service(self, name: str, build: Callable[[], object]):
+        with self._services_lock:
+            if name not in self._services:
+                provider = self._providers.get(name)
+                self._services[name] = provider() if provider else build()
+            return self._services[name]
+
+    # --- Core Services ---
+
+    @property
+    def web_search_service(self):
+        def build():
+            from core_services.web_search_service import WebSearchService
+            return WebSearchService()
+        return self._get_service("web_search_service", build)
+
+    @property
+    def video_producer(self):
+        def build():
+            from core_services.video_producer_service import VideoProducerService
+            return VideoProducerService(kill_switch=self.kill_switch)
+        return self._get_service("video_producer", build)
+
+    @property
+    def image_post_generator(self):
+        def build():
+            from core_services.image_post_generator_service import ImagePostGeneratorService
+            return ImagePostGeneratorService()
+        return self._get_service("image_post_generator", build)
+
+    @property
+    def content_generator(self):
+        def build():
+            from core_services.content_generator_service import ContentGeneratorService
+            return ContentGeneratorService(web_search_service=self.web_search_service, kill_switch=self.kill_switch)
+        return self._get_service("content_generator", build)
+
+    # --- Platform Services ---
+
+    @property
+    def youtube_service(self):
+        def build():
+            from platform_services.youtube_service import YouTubeService
+            return YouTubeService(content_generator=self.content_generator, video_producer=self.video_producer)
+        return self._get_service("youtube_service", build)
+
+    @property
+    def linkedin_service(self):
+        def build():
+            from platform_services.linkedin_service import LinkedInService
+            return LinkedInService(
+                content_generator_provider=lambda: self.content_generator,
+                image_generator_provider=lambda: self.video_producer,
+                image_post_generator_provider=lambda: self.image_post_generator
+            )
+        return self._get_service("linkedin_service", build)
+
+    @property
+    def astrology_service(self):
+        def build():
+            from platform_services.astrology_service import AstrologyService
+            return AstrologyService(
+                content_generator=self.content_generator, image_post_generator=self.image_post_generator,
+                kill_switch=self.kill_switch
+            )
+        return self._get_service("astrology_service", build)
+
+    @property
+    def instagram_service(self):
+        def build():
+            from platform_services.instagram_service import InstagramService
+            return InstagramService(
+                content_generator=self.content_generator, 
+                image_generator=self.video_producer,
+                image_post_generator=self.image_post_generator
+            )
+        return self._get_service("instagram_service", build)
+
+    # --- Automation Scheduler ---
+
+    @property
+    def scheduler(self):
+        def build():
+            from orchestration.automation_scheduler import AutomationScheduler
+            return AutomationScheduler(youtube_service_provider=lambda: self.youtube_service)
+        return self._get_service("scheduler", build)
 
     # --- Full, unabbreviated function bodies ---
 
@@ -55,57 +142,33 @@ class MainOrchestrator:
     def reset_kill_switch(self):
         self.kill_switch.clear()
 
-    def generate_all_astrology_posts(self):
-        self.reset_kill_switch()
-        try:
-            return self.astrology_service.create_daily_astrology_post_for_all_signs()
-        except InterruptedException:
-            return []
-        except Exception as e:
-            print(f"ORCHESTRATOR: Critical error during astrology generation: {e}")
-            return None
-
-    def generate_single_instagram_post(self, topic: str, niche: str):
-        self.reset_kill_switch()
-        try:
-            return self.instagram_service.create_general_post(topic=topic, niche=niche)
-        except InterruptedException:
-            return {"success": False, "message": "Operation Cancelled by User."}
-        except Exception as e:
-            print(f"ORCHESTRATOR: Critical error during Instagram post generation: {e}")
-            return {"success": False, "message": "A critical internal error occurred."}
-
-    def generate_single_linkedin_post(self, topic: str, niche: str):
-        self.reset_kill_switch()
-        try:
-            package = self.linkedin_service.generate_post_package(topic=topic, niche=niche)
-            if package and package.get("url"):
-                return {
-                    "success": True,
-                    "message": "LinkedIn post content generated successfully!",
-                    "url": package.get("url"),
-                    "caption": package.get("caption")
-                }
-            else:
-                return {"success": False, "message": "Failed to generate LinkedIn content package."}
-        except InterruptedException:
-            return {"success": False, "message": "Operation Cancelled by User."}
-        except Exception as e:
-            print(f"ORCHESTRATOR: Critical error during LinkedIn post generation: {e}")
-            return {"success": False, "message": "A critical internal error occurred."}
-
-    def generate_single_youtube_video(self, topic, niche, upload=True, image_source="ai_generated", auto_search_context=False):
-        self.reset_kill_switch()
-        try:
-            return self.youtube_service.create_and_upload_video(
-                topic=topic, niche=niche, upload=upload, 
-                image_source=image_source, auto_search_context=auto_search_context
-            )
-        except InterruptedException:
-            return {"success": False, "message": "Operation Cancelled by User."}
-        except Exception as e:
-            print(f"ORCHESTRATOR: Critical error during YouTube video generation: {e}")
-            return {"success": False, "message": "A critical internal error occurred."}
+    @_orchestrator_entry("astrology generation", cancelled=[], failed=None)
+    def generate_all_astrology_posts(self, force_refresh: bool = False):
+        return self.astrology_service.create_daily_astrology_post_for_all_signs(force_refresh=force_refresh)
+
+    @_orchestrator_entry("Instagram post generation")
+    def generate_single_instagram_post(self, topic: str, niche: str, force_refresh: bool = False):
+        return self.instagram_service.create_general_post(topic=topic, niche=niche, force_refresh=force_refresh)
+
+    @_orchestrator_entry("LinkedIn post generation")
+    def generate_single_linkedin_post(self, topic: str, niche: str, force_refresh: bool = False):
+        package = self.linkedin_service.generate_post_package(topic=topic, niche=niche, force_refresh=force_refresh)
+        if package and package.get("url"):
+            return {
+                "success": True,
+                "message": "LinkedIn post content generated successfully!",
+                "url": package.get("url"),
+                "caption": package.get("caption")
+            }
+        else:
+            return {"success": False, "message": "Failed to generate LinkedIn content package."}
+
+    @_orchestrator_entry("YouTube video generation")
+    def generate_single_youtube_video(self, topic, niche, upload=True, image_source="ai_generated", auto_search_context=False, preview=None):
+        return self.youtube_service.create_and_upload_video(
+            topic=topic, niche=niche, upload=upload, 
+            image_source=image_source, auto_search_context=auto_search_context, preview=preview
+        )
     
     def start_automation(self):
         self.scheduler.start()
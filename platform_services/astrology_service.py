@@ -1,81 +1,217 @@
 # src/platform_services/astrology_service.py
 
 import os
+import json
 import random
+import hashlib
+import tempfile
+import threading
 import requests
-from config import PEXELS_API_KEY, DATA_PATH
-from typing import TYPE_CHECKING
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import settings
+from utils.exceptions import InterruptedException
+from utils.response_cache import ResponseCache
+from utils.log import get_logger
+from typing import TYPE_CHECKING, NamedTuple
 
 if TYPE_CHECKING:
     from core_services.content_generator_service import ContentGeneratorService
     from core_services.image_post_generator_service import ImagePostGeneratorService
 
-try:
-    from pexels_api import API
-except ImportError:
-    API = None
+logger = get_logger("astrology")
+
+class AstrologyPost(NamedTuple):
+    sign: str
+    url: str
+    caption: str = "No caption available."
+
+ZODIAC_SIGNS = ("aries", "taurus", "gemini", "cancer", "leo", "virgo", "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces")
+SIGN_TITLES = {sign: sign.capitalize() for sign in ZODIAC_SIGNS}
+
+PEXELS_SEARCH_URL = "https://api.pexels.com/v1/search"
+# Downloaded Pexels photos are kept on disk and reused; the least recently used are pruned past this.
+PEXELS_IMAGE_CACHE_MAX_FILES = 200
 
 class AstrologyService:
-    def __init__(self, content_generator: 'ContentGeneratorService', image_post_generator: 'ImagePostGeneratorService'):
+    def __init__(self, content_generator: 'ContentGeneratorService', image_post_generator: 'ImagePostGeneratorService', kill_switch: threading.Event | None = None):
         self.content_generator = content_generator
         self.image_post_generator = image_post_generator
-        self.temp_images_path = os.path.join(DATA_PATH, "temp_images")
-        os.makedirs(self.temp_images_path, exist_ok=True)
+        self.kill_switch = kill_switch or threading.Event()
+        self.max_workers = 12
+        # Keep-alive pool sized for the concurrent per-sign searches and downloads (the default
+        # of 10 would discard connections), with quick retries for flaky responses.
+        self.http_session = requests.Session()
+        self.http_session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        ))
+        # Daily runs repeat the same colour queries, so search results are cached for a day
+        # and photos are cached by URL.
+        pexels_cache_path = os.path.join(settings().data_path, "pexels_cache")
+        self.image_cache_path = os.path.join(pexels_cache_path, "images")
+        os.makedirs(self.image_cache_path, exist_ok=True)
+        self.search_cache = ResponseCache(os.path.join(pexels_cache_path, "searches"), max_entries=256, ttl_seconds=24 * 3600)
 
-        if not PEXELS_API_KEY or not API:
-            self.pexels_api = None
-            print("⚠️  Warning: Pexels API key not configured or pexels_api library not installed.")
+        self.pexels_api_key = settings().pexels_api_key
+        if not self.pexels_api_key:
+            logger.warning("⚠️  Warning: Pexels API key not configured.")
         else:
-            self.pexels_api = API(PEXELS_API_KEY)
-            print("✅ Astrology Service initialized with Pexels API.")
+            logger.info("✅ Astrology Service initialized with Pexels API.")
+
+    def _search_photo_urls(self, query: str) -> list[str]:
+        cache_key = ResponseCache.make_key("pexels", query)
+        cached = self.search_cache.get(cache_key)
+        if cached:
+            return json.loads(cached)
+        logger.info(f"   - 🔎 Searching Pexels for: '{query}'...")
+        # A plain REST call on the shared session holds no per-search state, so signs search concurrently.
+        response = self.http_session.get(
+            PEXELS_SEARCH_URL,
+            params={"query": query, "page": random.randint(1, 5), "per_page": 15},
+            headers={"Authorization": self.pexels_api_key},
+            timeout=15
+        )
+        response.raise_for_status()
+        urls = [photo["src"]["original"] for photo in response.json().get("photos", [])]
+        if urls:
+            self.search_cache.set(cache_key, json.dumps(urls))
+        return urls
+
+    def _prune_image_cache(self):
+        try:
+            photos = [entry for entry in os.scandir(self.image_cache_path) if entry.name.endswith(".jpg")]
+            entries = sorted(photos, key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in entries[PEXELS_IMAGE_CACHE_MAX_FILES:]:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"   - ⚠️ Could not prune the Pexels image cache: {e}")
 
-    def _get_royalty_free_image(self, query: str, sign: str) -> str | None:
-        if not self.pexels_api: return None
+    def _download_photo(self, url: str, sign: str) -> str:
+        """Returns the cached local copy of a photo, downloading it on first use."""
+        cached_path = os.path.join(self.image_cache_path, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+        if os.path.exists(cached_path):
+            os.utime(cached_path)  # Mark as recently used for pruning.
+            return cached_path
+        # Uniquely named partial file in the cache dir (same filesystem, so os.replace is atomic),
+        # so concurrent signs or overlapping runs fetching the same photo never share a path.
+        with tempfile.NamedTemporaryFile(dir=self.image_cache_path, suffix=".part", delete=False) as f:
+            partial_path = f.name
+        # Stream straight to disk instead of buffering the full-size original in memory.
         try:
-            print(f"   - 🔎 Searching Pexels for: '{query}'...")
-            self.pexels_api.search(query, page=random.randint(1, 5), results_per_page=15)
-            photos = self.pexels_api.get_entries()
-            if not photos: return None
-            
-            response = requests.get(random.choice(photos).original, timeout=15)
-            response.raise_for_status()
-            
-            temp_path = os.path.join(self.temp_images_path, f"temp_pexels_{sign}.jpg")
-            with open(temp_path, "wb") as f:
-                f.write(response.content)
-            return temp_path
+            with self.http_session.get(url, timeout=15, stream=True) as response:
+                response.raise_for_status()
+                with open(partial_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        # Full-size originals can take a while; let a stop request cut the download short.
+                        self._check_kill_switch(sign)
+                        f.write(chunk)
+            os.replace(partial_path, cached_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        self._prune_image_cache()
+        return cached_path
+
+    def _search_unique_queries(self, executor: ThreadPoolExecutor, queries) -> dict:
+        """Starts one search per distinct query; signs that share a lucky colour share the results."""
+        if not self.pexels_api_key: return {}
+        return {query: executor.submit(self._search_photo_urls, query) for query in set(queries)}
+
+    def _get_royalty_free_image(self, query: str, sign: str, urls: list[str] | None = None) -> str | None:
+        if not self.pexels_api_key: return None
+        try:
+            if urls is None:
+                urls = self._search_photo_urls(query)
+            if not urls: return None
+            return self._download_photo(random.choice(urls), sign)
+        except InterruptedException:
+            raise
         except Exception as e:
-            print(f"   - ❌ Error fetching image from Pexels: {e}")
+            logger.error(f"   - ❌ Error fetching image from Pexels: {e}")
             return None
 
-    def create_daily_astrology_post_for_all_signs(self):
-        print("\n🔮 Starting AI-Powered Daily Astrology Post Generation 🔮")
-        zodiac_signs = ["aries", "taurus", "gemini", "cancer", "leo", "virgo", "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces"]
-        all_posts = []
-        for sign in zodiac_signs:
-            print(f"\n--- Generating post for {sign.upper()} ---")
-            
-            raw_data = self.content_generator.generate_astrology_data(sign)
-            if not raw_data: continue
-            
-            caption = self.content_generator.create_astrology_caption(raw_data)
-            
-            image_query = f"mystical {raw_data.get('color', 'space')} abstract"
-            base_image_path = self._get_royalty_free_image(image_query, sign)
-            if not base_image_path: continue
-            
-            # --- THE FIX: We no longer pass custom font sizes. We trust the image generator. ---
-            final_post_url = self.image_post_generator.create_post_image(
-                base_image_path=base_image_path, 
-                text=raw_data.get('description'), 
-                title=sign.capitalize()
+    def _check_kill_switch(self, sign: str):
+        if self.kill_switch.is_set():
+            raise InterruptedException(f"Astrology generation cancelled before finishing {sign}.")
+
+    @staticmethod
+    def _image_query(raw_data: dict) -> str:
+        return f"mystical {raw_data.get('color', 'space')} abstract"
+
+    def _create_post_image_for_sign(self, sign: str, raw_data: dict, search_future=None) -> str | None:
+        """Runs the image -> overlay -> upload chain for a single sign."""
+        self._check_kill_switch(sign)
+        urls = None
+        if search_future is not None:
+            try:
+                urls = search_future.result()
+            except Exception as e:
+                logger.error(f"   - ❌ Error searching Pexels for {sign}: {e}")
+                return None
+        base_image_path = self._get_royalty_free_image(self._image_query(raw_data), sign, urls)
+        if not base_image_path: return None
+
+        self._check_kill_switch(sign)
+        # --- THE FIX: We no longer pass custom font sizes. We trust the image generator. ---
+        # The base image stays in the Pexels cache for future runs.
+        return self.image_post_generator.create_post_image(
+            base_image_path=base_image_path, 
+            text=raw_data.get('description'), 
+            title=SIGN_TITLES.get(sign, sign.capitalize())
+        )
+
+    def _run_for_signs(self, executor: ThreadPoolExecutor, fn, args_by_sign: dict) -> dict:
+        """
+        Runs fn(sign, *args) for every sign concurrently and returns the truthy
+        results keyed by sign. A kill-switch interruption cancels pending work.
+        """
+        futures = {executor.submit(fn, sign, *args): sign for sign, args in args_by_sign.items()}
+        results = {}
+        try:
+            for future in as_completed(futures):
+                sign = futures[future]
+                try:
+                    result = future.result()
+                except InterruptedException:
+                    raise
+                except Exception as e:
+                    logger.error(f"   - ❌ Error generating post for {sign}: {e}")
+                    continue
+                if result:
+                    results[sign] = result
+        except InterruptedException:
+            for future in futures:
+                future.cancel()
+            raise
+        return results
+
+    def create_daily_astrology_post_for_all_signs(self, force_refresh: bool = False) -> list[AstrologyPost]:
+        """
+        Horoscopes and captions are served from the day-keyed LLM response cache when the
+        same day is generated again; `force_refresh` asks the model for new ones.
+        """
+        logger.info("\n🔮 Starting AI-Powered Daily Astrology Post Generation 🔮")
+        # Each sign is an independent, network-bound chain, so they run concurrently.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self._check_kill_switch("horoscopes")
+            raw_data_by_sign = self.content_generator.generate_astrology_data_for_signs(ZODIAC_SIGNS, bypass_cache=force_refresh)
+
+            # Colours repeat across signs, so search each distinct query once, while the captions are written.
+            searches = self._search_unique_queries(executor, map(self._image_query, raw_data_by_sign.values()))
+
+            self._check_kill_switch("captions")
+            captions = self.content_generator.create_all_astrology_captions(raw_data_by_sign, bypass_cache=force_refresh)
+
+            urls_by_sign = self._run_for_signs(
+                executor, self._create_post_image_for_sign,
+                {sign: (raw_data, searches.get(self._image_query(raw_data))) for sign, raw_data in raw_data_by_sign.items()}
             )
-            
-            if final_post_url:
-                all_posts.append({"sign": sign, "url": final_post_url, "caption": caption})
-            
-            if base_image_path and os.path.exists(base_image_path):
-                os.remove(base_image_path)
-        
-        print(f"\n✨ --- Process Complete! Generated {len(all_posts)} posts. --- ✨")
+
+        all_posts = [
+            AstrologyPost(sign=sign, url=urls_by_sign[sign], caption=captions[sign])
+            for sign in ZODIAC_SIGNS if sign in urls_by_sign
+        ]
+        logger.info(f"\n✨ --- Process Complete! Generated {len(all_posts)} posts. --- ✨")
         return all_posts
\ No newline at end of file
@@ -1,11 +1,17 @@
 # src/platform_services/instagram_service.py
 
+import os
 from typing import TYPE_CHECKING
+from config import settings
+from utils.log import get_logger
+from utils.post_package_cache import PostPackageCache
 if TYPE_CHECKING:
     from core_services.content_generator_service import ContentGeneratorService
     from core_services.image_post_generator_service import ImagePostGeneratorService
     from core_services.video_producer_service import VideoProducerService
 
+logger = get_logger("instagram")
+
 class InstagramService:
     """
     Handles generation of general Instagram posts using the professional two-step method.
@@ -14,34 +20,44 @@ class InstagramService:
         self.content_generator = content_generator
         self.image_generator = image_generator 
         self.image_post_generator = image_post_generator
-        print("✅ General Instagram Service initialized (Professional Method v2).")
+        self.post_cache = PostPackageCache(os.path.join(settings().data_path, "social_post_cache"))
+        logger.info("✅ General Instagram Service initialized (Professional Method v2).")
 
-    def create_general_post(self, topic: str, niche: str):
-        print(f"\nINSTAGRAM: Generating professional post for topic: '{topic}'...")
+    def create_general_post(self, topic: str, niche: str, force_refresh: bool = False):
+        logger.info(f"\nINSTAGRAM: Generating professional post for topic: '{topic}'...")
+        scratch_image_path = None
         try:
-            # Step 1: Generate text content and a SEPARATE, VISUAL-ONLY prompt for the background.
-            content_data = self.content_generator.generate_social_post_content(
-                topic=topic, niche=niche, platform="Instagram"
-            )
-            if not content_data:
-                raise Exception("Failed to generate text content from AI.")
+            cache_key = PostPackageCache.make_key("Instagram", niche, topic, "1:1")
+            cached = None if force_refresh else self.post_cache.get(cache_key)
+            if cached:
+                logger.info("INSTAGRAM: ♻️ Reusing the saved text and background for this topic.")
+                content_data, background_image_path = cached
+            else:
+                # Step 1: Generate text content and a SEPARATE, VISUAL-ONLY prompt for the background.
+                content_data = self.content_generator.generate_social_post_content(
+                    topic=topic, niche=niche, platform="Instagram", bypass_cache=force_refresh
+                )
+                if not content_data:
+                    raise Exception("Failed to generate text content from AI.")
+
+                # --- THE CRITICAL CHANGE ---
+                # Step 2: Use the new, clean "background_image_prompt" directly.
+                background_prompt = content_data.get("background_image_prompt", f"A clean, minimalist background related to {niche}")
+                logger.info(f"INSTAGRAM: Generating clean background image with prompt: '{background_prompt}'")
+                
+                # Step 3: Generate the background image.
+                image_paths = self.image_generator._generate_images_with_stability([background_prompt], aspect_ratio="1:1")
+                if not image_paths:
+                    raise Exception("Failed to generate a background image.")
+                
+                scratch_image_path = image_paths[0]
+                background_image_path = self.post_cache.set(cache_key, content_data, scratch_image_path) or scratch_image_path
 
-            # --- THE CRITICAL CHANGE ---
-            # Step 2: Use the new, clean "background_image_prompt" directly.
-            background_prompt = content_data.get("background_image_prompt", f"A clean, minimalist background related to {niche}")
-            print(f"INSTAGRAM: Generating clean background image with prompt: '{background_prompt}'")
-            
-            # Step 3: Generate the background image.
-            image_paths = self.image_generator._generate_images_with_stability([background_prompt], aspect_ratio="1:1")
-            if not image_paths:
-                raise Exception("Failed to generate a background image.")
-            
-            background_image_path = image_paths[0]
             post_text_content = content_data.get("post_text")
             final_caption_for_upload = f"{post_text_content}\n\n{' '.join(content_data.get('hashtags', []))}"
 
             # Step 4: Use the ImagePostGeneratorService to overlay the clean text onto the background.
-            print("INSTAGRAM: Overlaying clean text onto the background image...")
+            logger.info("INSTAGRAM: Overlaying clean text onto the background image...")
             final_post_url = self.image_post_generator.create_post_image(
                 base_image_path=background_image_path,
                 text=post_text_content, # This is the text written ON the image
@@ -51,7 +67,7 @@ class InstagramService:
             if not final_post_url:
                 raise Exception("Failed to overlay text and create the final post image.")
 
-            print("✅ Professional Instagram post generated successfully.")
+            logger.info("✅ Professional Instagram post generated successfully.")
             return {
                 "success": True, 
                 "message": "Instagram post generated successfully using the professional method!",
@@ -60,5 +76,9 @@ class InstagramService:
             }
 
         except Exception as e:
-            print(f"   - ❌ Error in create_general_post (Instagram): {e}")
-            return {"success": False, "message": str(e)}
\ No newline at end of file
+            logger.error(f"   - ❌ Error in create_general_post (Instagram): {e}")
+            return {"success": False, "message": str(e)}
+        finally:
+            # Stability writes into RAM-backed scratch space; the post cache keeps its own copy.
+            if scratch_image_path and os.path.exists(scratch_image_path):
+                os.remove(scratch_image_path)
\ No newline at end of file
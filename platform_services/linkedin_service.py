@@ -1,57 +1,123 @@
 # src/platform_services/linkedin_service.py
 
+import os
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlencode
-from config import LINKEDIN_CLIENT_ID, LINKEDIN_CLIENT_SECRET, LINKEDIN_REDIRECT_URI
-from typing import TYPE_CHECKING
+from config import settings
+from utils.post_package_cache import PostPackageCache
+from typing import TYPE_CHECKING, Callable
 
 if TYPE_CHECKING:
     from core_services.content_generator_service import ContentGeneratorService
     from core_services.image_post_generator_service import ImagePostGeneratorService
     from core_services.video_producer_service import VideoProducerService
 
+# LinkedIn's size limit for a feed image upload.
+LINKEDIN_MAX_IMAGE_BYTES = 100 * 1024 * 1024
+
 class LinkedInService:
-    def __init__(self, content_generator: 'ContentGeneratorService', image_generator: 'VideoProducerService', image_post_generator: 'ImagePostGeneratorService'):
-        self.content_generator = content_generator
-        self.image_generator = image_generator
-        self.image_post_generator = image_post_generator
+    AUTH_URL = "https://www.linkedin.com/oauth/v2/authorization"
+    TOKEN_URL = "https://www.linkedin.com/oauth/v2/accessToken"
+    API_BASE_URL = "https://api.linkedin.com/v2"
+    AUTH_SCOPE = "openid profile w_member_social"
+
+    def __init__(
+        self,
+        content_generator_provider: Callable[[], 'ContentGeneratorService'],
+        image_generator_provider: Callable[[], 'VideoProducerService'],
+        image_post_generator_provider: Callable[[], 'ImagePostGeneratorService']
+    ):
+        # Resolved when a post is first generated, so the settings panel's connection check
+        # doesn't load moviepy and the OpenAI SDK.
+        self._content_generator_provider = content_generator_provider
+        self._image_generator_provider = image_generator_provider
+        self._image_post_generator_provider = image_post_generator_provider
+        self._content_generator = None
+        self._image_generator = None
+        self._image_post_generator = None
         
-        self.client_id = LINKEDIN_CLIENT_ID
-        self.client_secret = LINKEDIN_CLIENT_SECRET
-        self.redirect_uri = LINKEDIN_REDIRECT_URI
+        config = settings()
+        self.post_cache = PostPackageCache(os.path.join(config.data_path, "social_post_cache"))
+        self.client_id = config.linkedin_client_id
+        self.client_secret = config.linkedin_client_secret
+        self.redirect_uri = config.linkedin_redirect_uri
 
-        self.auth_url = "https://www.linkedin.com/oauth/v2/authorization"
-        self.token_url = "https://www.linkedin.com/oauth/v2/accessToken"
-        self.api_base_url = "https://api.linkedin.com/v2"
+        # Everything in the authorization URL is fixed by configuration, so it is built once.
+        self._auth_request_url = f"{self.AUTH_URL}?" + urlencode({
+            'response_type': 'code',
+            'client_id': self.client_id,
+            'redirect_uri': self.redirect_uri,
+            'state': 'a_random_state_string_for_security',
+            'scope': self.AUTH_SCOPE
+        })
         
         self.access_token = None
         self.user_urn = None
+        # The register-upload request only varies by owner, so it is serialized once per login.
+        self._register_upload_body = None
+        # The publish flow makes three calls back to back; reuse one keep-alive connection for them.
+        # urllib3 does not retry POSTs by default, so a post is never created twice.
+        self.http_session = requests.Session()
+        self.http_session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        ))
 
         if not self.client_id or not self.client_secret:
             print("⚠️  Warning: LinkedIn credentials not found.")
         else:
             print("✅ LinkedIn Service initialized (Professional Method).")
 
+    @property
+    def content_generator(self) -> 'ContentGeneratorService':
+        if self._content_generator is None:
+            self._content_generator = self._content_generator_provider()
+        return self._content_generator
+
+    @property
+    def image_generator(self) -> 'VideoProducerService':
+        if self._image_generator is None:
+            self._image_generator = self._image_generator_provider()
+        return self._image_generator
+
+    @property
+    def image_post_generator(self) -> 'ImagePostGeneratorService':
+        if self._image_post_generator is None:
+            self._image_post_generator = self._image_post_generator_provider()
+        return self._image_post_generator
+
     def is_authenticated(self) -> bool:
         return self.access_token is not None
 
-    def generate_post_package(self, niche, topic):
+    def generate_post_package(self, niche, topic, force_refresh: bool = False):
         print(f"LINKEDIN: Generating professional post for topic: '{topic}'...")
+        scratch_image_path = None
         try:
-            content_data = self.content_generator.generate_social_post_content(
-                topic=topic, niche=niche, platform="LinkedIn"
-            )
-            if not content_data:
-                raise Exception("Failed to generate text content from AI.")
+            cache_key = PostPackageCache.make_key("LinkedIn", niche, topic, "1:1")
+            cached = None if force_refresh else self.post_cache.get(cache_key)
+            if cached:
+                print("LINKEDIN: ♻️ Reusing the saved text and background for this topic.")
+                content_data, background_image_path = cached
+            else:
+                content_data = self.content_generator.generate_social_post_content(
+                    topic=topic, niche=niche, platform="LinkedIn", bypass_cache=force_refresh
+                )
+                if not content_data:
+                    raise Exception("Failed to generate text content from AI.")
+
+                background_prompt = content_data.get("background_image_prompt", f"A professional, clean background for a post about {niche}")
+                print(f"LINKEDIN: Generating clean background image with prompt: '{background_prompt}'")
+                
+                image_paths = self.image_generator._generate_images_with_stability([background_prompt], aspect_ratio="1:1")
+                if not image_paths:
+                    raise Exception("Failed to generate a background image.")
+                
+                scratch_image_path = image_paths[0]
+                background_image_path = self.post_cache.set(cache_key, content_data, scratch_image_path) or scratch_image_path
 
-            background_prompt = content_data.get("background_image_prompt", f"A professional, clean background for a post about {niche}")
-            print(f"LINKEDIN: Generating clean background image with prompt: '{background_prompt}'")
-            
-            image_paths = self.image_generator._generate_images_with_stability([background_prompt], aspect_ratio="1:1")
-            if not image_paths:
-                raise Exception("Failed to generate a background image.")
-            
-            background_image_path = image_paths[0]
             post_text_content = content_data.get("post_text")
             final_caption_for_upload = f"{post_text_content}\n\n{' '.join(content_data.get('hashtags', []))}"
             
@@ -72,19 +138,16 @@ class LinkedInService:
         except Exception as e:
             print(f"   - ❌ Error in generate_post_package (LinkedIn): {e}")
             return None
+        finally:
+            # Stability writes into RAM-backed scratch space; the post cache keeps its own copy.
+            if scratch_image_path and os.path.exists(scratch_image_path):
+                os.remove(scratch_image_path)
 
     # --- FULL, UNABBREVIATED AUTHENTICATION FUNCTIONS ---
 
     def generate_auth_url(self):
         """Generates the authorization URL for the user to click."""
-        params = {
-            'response_type': 'code',
-            'client_id': self.client_id,
-            'redirect_uri': self.redirect_uri,
-            'state': 'a_random_state_string_for_security',
-            'scope': 'openid profile w_member_social'
-        }
-        return f"{self.auth_url}?{urlencode(params)}"
+        return self._auth_request_url
 
     def exchange_code_for_token(self, auth_code):
         """Exchanges the authorization code from the redirect for an access token."""
@@ -96,32 +159,55 @@ class LinkedInService:
             'client_secret': self.client_secret
         }
         try:
-            response = requests.post(self.token_url, data=data, timeout=10)
+            response = self.http_session.post(self.TOKEN_URL, data=data, timeout=10)
             response.raise_for_status()
-            self.access_token = response.json().get('access_token')
+            self.access_token = orjson.loads(response.content).get('access_token')
             if self.access_token:
+                self.http_session.headers["Authorization"] = f"Bearer {self.access_token}"
                 return {"success": True}
             return {"success": False, "message": "Access token not found in response."}
-        except requests.RequestException as e:
-            error_details = e.response.json() if e.response else str(e)
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            error_details = self._error_details(e)
             print(f"   - ❌ LinkedIn token exchange failed: {error_details}")
             return {"success": False, "message": f"API Error: {error_details}"}
 
+    @staticmethod
+    def _error_details(error: Exception):
+        """Returns the API's error body (parsed when it is JSON), or the exception text if there is none."""
+        # A 4xx/5xx Response is falsy, so it has to be compared with None.
+        response = getattr(error, "response", None)
+        if response is None:
+            return str(error)
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            return response.text or str(error)
+
     def fetch_user_info(self):
         """Fetches the authenticated user's URN ('sub' field), required for posting."""
         if not self.access_token: return False
         try:
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            response = requests.get(f"{self.api_base_url}/userinfo", headers=headers, timeout=10)
+            response = self.http_session.get(f"{self.API_BASE_URL}/userinfo", timeout=10)
             response.raise_for_status()
-            user_data = response.json()
+            user_data = orjson.loads(response.content)
             self.user_urn = f"urn:li:person:{user_data['sub']}"
+            self._register_upload_body = orjson.dumps({"registerUploadRequest": {"recipes": ["urn:li:digitalmediaRecipe:feedshare-image"],"owner": self.user_urn,"serviceRelationships": [{"relationshipType": "OWNER","identifier": "urn:li:userGeneratedContent"}]}})
             print(f"✅ Fetched LinkedIn user URN: {self.user_urn}")
             return True
         except Exception as e:
             print(f"   - ❌ Error fetching LinkedIn user info: {e}")
             return False
 
+    def complete_authentication(self, auth_code):
+        """Runs the token exchange and profile lookup as one unit, suitable for a background thread."""
+        token_response = self.exchange_code_for_token(auth_code)
+        if not token_response or not token_response.get("success"):
+            error_msg = (token_response or {}).get('message', 'An unknown error occurred.')
+            return {"success": False, "message": f"Connection failed: {error_msg}"}
+        if not self.fetch_user_info():
+            return {"success": False, "message": "Authentication succeeded, but failed to fetch user profile."}
+        return {"success": True, "message": "✅ LinkedIn connected successfully!"}
+
     def publish_post(self, post_data):
         """Publishes the given post data (text and image) to LinkedIn."""
         if not self.is_authenticated() or not self.user_urn:
@@ -130,6 +216,10 @@ class LinkedInService:
         image_path = post_data.get("image_path")
         if not all([post_text, image_path]):
             return {"success": False, "message": "Post data is incomplete."}
+        # Reject unusable files before the register call spends a round trip on them.
+        image_error = self._validate_image(image_path)
+        if image_error:
+            return {"success": False, "message": image_error}
 
         print("LINKEDIN: Step 1/3 - Registering image...")
         upload_url, asset_id = self._register_image()
@@ -141,13 +231,29 @@ class LinkedInService:
         print("LINKEDIN: Step 3/3 - Creating the final post...")
         return self._create_ugc_post(post_text, asset_id)
 
+    @staticmethod
+    def _validate_image(image_path) -> str | None:
+        """Returns why the file can't be published, or None if it looks like a PNG, JPEG, GIF or WebP image."""
+        try:
+            size = os.path.getsize(image_path)
+            with open(image_path, 'rb') as f:
+                signature = f.read(12)
+        except OSError as e:
+            return f"Image file is not readable: {e}"
+        if size == 0:
+            return "Image file is empty."
+        if size > LINKEDIN_MAX_IMAGE_BYTES:
+            return "Image file is larger than LinkedIn's 100 MB limit."
+        is_webp = signature[:4] == b'RIFF' and signature[8:12] == b'WEBP'
+        if not (signature.startswith((b'\x89PNG', b'\xff\xd8\xff', b'GIF8')) or is_webp):
+            return "Image file is not a PNG, JPEG, GIF or WebP image."
+        return None
+
     def _register_image(self):
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        body = {"registerUploadRequest": {"recipes": ["urn:li:digitalmediaRecipe:feedshare-image"],"owner": self.user_urn,"serviceRelationships": [{"relationshipType": "OWNER","identifier": "urn:li:userGeneratedContent"}]}}
         try:
-            response = requests.post(f"{self.api_base_url}/assets?action=registerUpload", headers=headers, json=body)
+            response = self.http_session.post(f"{self.API_BASE_URL}/assets?action=registerUpload", data=self._register_upload_body, headers={"Content-Type": "application/json"})
             response.raise_for_status()
-            data = response.json()['value']
+            data = orjson.loads(response.content)['value']
             return data['uploadMechanism']['com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest']['uploadUrl'], data['asset']
         except Exception as e:
             print(f"   - ❌ LinkedIn Error (Registering Image): {e}")
@@ -156,7 +262,7 @@ class LinkedInService:
     def _upload_image(self, upload_url, image_path):
         try:
             with open(image_path, 'rb') as f:
-                response = requests.put(upload_url, data=f, headers={"Authorization": f"Bearer {self.access_token}"})
+                response = self.http_session.put(upload_url, data=f)
             response.raise_for_status()
             return response.status_code == 201
         except Exception as e:
@@ -164,13 +270,12 @@ class LinkedInService:
             return False
 
     def _create_ugc_post(self, post_text, asset_id):
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         post_body = {"author": self.user_urn,"lifecycleState": "PUBLISHED","specificContent": {"com.linkedin.ugc.ShareContent": {"shareCommentary": {"text": post_text},"shareMediaCategory": "IMAGE","media": [{"status": "READY", "media": asset_id}]}},"visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}}
         try:
-            response = requests.post(f"{self.api_base_url}/ugcPosts", headers=headers, json=post_body)
+            response = self.http_session.post(f"{self.API_BASE_URL}/ugcPosts", data=orjson.dumps(post_body), headers={"Content-Type": "application/json"})
             response.raise_for_status()
             print("✅ Post published successfully to LinkedIn!")
-            return {"success": True, "data": response.json()}
+            return {"success": True, "data": orjson.loads(response.content)}
         except Exception as e:
             print(f"   - ❌ LinkedIn Error (Creating Post): {e}")
             return {"success": False, "message": "Failed to create the final post."}
\ No newline at end of file
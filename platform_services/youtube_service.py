@@ -2,6 +2,7 @@
 
 import os
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -29,19 +30,41 @@ class YouTubeService:
         else:
             print("❌ YouTube Service failed to authenticate.")
 
-    def create_and_upload_video(self, niche, topic, voice_type="female_voice", upload=True, image_source="ai_generated", auto_search_context=False):
+    def create_and_upload_video(self, niche, topic, voice_type="female_voice", upload=True, image_source="ai_generated", auto_search_context=False, preview=None):
         print(f"\nYOUTUBE_SERVICE: Starting video pipeline for topic '{topic}'...")
         try:
             print("   - Step 1/3: Generating content package...")
-            content_package = self.content_generator.generate_complete_video_content(
-                topic=topic, niche=niche, auto_search_context=auto_search_context
-            )
-            if not content_package:
-                raise Exception("Failed to generate content package.")
-            
+            # Images are generated in the background as soon as their prompts stream in,
+            # overlapping Stability calls with the rest of the script generation.
+            with ThreadPoolExecutor(max_workers=1) as image_executor:
+                image_future = None
+                early_prompts = None
+                def start_image_generation(image_prompts):
+                    nonlocal image_future, early_prompts
+                    early_prompts = image_prompts
+                    image_future = image_executor.submit(self.video_producer._generate_images_with_stability, image_prompts)
+
+                try:
+                    content_package = self.content_generator.generate_complete_video_content(
+                        topic=topic, niche=niche, auto_search_context=auto_search_context,
+                        on_image_prompts=start_image_generation, preview=preview
+                    )
+                    if not content_package:
+                        raise Exception("Failed to generate content package.")
+                    image_paths = image_future.result() if image_future else None
+                    # A truncated or unparseable first reply is regenerated, and the early images
+                    # then belong to prompts the final script no longer uses.
+                    if image_future and content_package.get("image_prompts") != early_prompts:
+                        print("   - ♻️ Content package was regenerated; discarding the images made from its first draft.")
+                        self._discard_pending_images(image_future)
+                        image_paths = None
+                except Exception:
+                    self._discard_pending_images(image_future)
+                    raise
+
             print("   - Step 2/3: Producing video file...")
             video_filepath = self.video_producer.produce_complete_video(
-                content_package, voice_type, image_source=image_source
+                content_package, voice_type, image_source=image_source, image_paths=image_paths
             )
             if not video_filepath:
                 raise Exception("Video production failed or was cancelled.")
@@ -64,6 +87,17 @@ class YouTubeService:
             print(f"   - ❌ Error in create_and_upload_video (YouTube): {e}")
             return {"success": False, "message": str(e)}
 
+    def _discard_pending_images(self, image_future):
+        """Removes images generated ahead of a content package that was never used."""
+        if not image_future: return
+        try:
+            image_paths = image_future.result()
+        except Exception:
+            return
+        for path in image_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
     def authenticate(self):
         creds = None
         
@@ -91,10 +125,7 @@ class YouTubeService:
                 flow = InstalledAppFlow.from_client_secrets_info(eval(credentials_content), self.SCOPES)
                 creds = flow.run_local_server(port=0)
 
-            with open("temp_token.pickle", "wb") as token_file:
-                pickle.dump(creds, token_file)
-            storage_service.upload_file("temp_token.pickle", self.token_object_name)
-            os.remove("temp_token.pickle") 
+            storage_service.upload_bytes(pickle.dumps(creds), self.token_object_name, public=False)
         
         return build('youtube', 'v3', credentials=creds)
 
@@ -0,0 +1,39 @@
+# src/utils/async_runtime.py
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+MAX_WORKERS = 4
+
+_executor = None
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_executor():
+    """Creates and returns the long-lived thread pool used for background generation."""
+    global _executor
+    if _executor is None:
+        print("   - Creating background generation thread pool...")
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="generation")
+    return _executor
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Schedules a blocking call on the background pool and returns its Future handle."""
+    return get_executor().submit(fn, *args, **kwargs)
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns a process-wide event loop running in a daemon thread. Async clients with
+    pooled connections are bound to one loop, so every coroutine must run on this one.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            print("   - Starting background event loop...")
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True).start()
+    return _loop
+
+def run_coroutine(coro):
+    """Runs a coroutine on the shared background loop and blocks until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
@@ -0,0 +1,37 @@
+# src/utils/log.py
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+ROOT_LOGGER_NAME = "autonomous247"
+
+_listener = None
+_listener_lock = threading.Lock()
+
+def _start_listener(root: logging.Logger):
+    """Routes every record through a queue drained by one background thread writing to stderr."""
+    global _listener
+    records = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    _listener = logging.handlers.QueueListener(records, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(logging.INFO)
+    # The scheduler configures the root logger for its log file; don't echo these records there too.
+    root.propagate = False
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a child of the app logger. Worker threads only enqueue records, so they
+    never block on console I/O or interleave partial lines.
+    """
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    with _listener_lock:
+        if _listener is None:
+            _start_listener(root)
+    return root.getChild(name)
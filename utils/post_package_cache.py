@@ -0,0 +1,75 @@
+# src/utils/post_package_cache.py
+import json
+import os
+import shutil
+import tempfile
+
+from utils.response_cache import ResponseCache
+
+class PostPackageCache:
+    """
+    Keeps the generated text and background image of a social post on disk, keyed by
+    the post's inputs, so asking for the same post again (retries, previews) skips the
+    LLM and Stability calls. Only the most recently used `max_entries` posts are kept.
+    """
+    def __init__(self, path: str, max_entries: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def make_key(platform: str, niche: str, topic: str, aspect_ratio: str) -> str:
+        return ResponseCache.make_key(platform, niche, topic, aspect_ratio)
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        return os.path.join(self.path, f"{key}.json"), os.path.join(self.path, f"{key}.png")
+
+    def get(self, key: str) -> tuple[dict, str] | None:
+        """Returns (content_data, image_path) for a cached post, or None."""
+        json_path, image_path = self._paths(key)
+        try:
+            with open(json_path, encoding="utf-8") as f:
+                content_data = json.load(f)
+            if not os.path.exists(image_path):
+                return None
+            os.utime(json_path)  # Mark as recently used for pruning.
+        except (OSError, ValueError):
+            return None
+        return content_data, image_path
+
+    def _write_atomic(self, final_path: str, write):
+        # Same directory, so os.replace is atomic and readers never see a partial file.
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".part", delete=False) as f:
+            partial_path = f.name
+            try:
+                write(f)
+            except BaseException:
+                f.close()
+                os.remove(partial_path)
+                raise
+        os.replace(partial_path, final_path)
+
+    def set(self, key: str, content_data: dict, image_path: str) -> str | None:
+        """Stores a copy of the image with the content; returns the cached image path, or None on failure."""
+        json_path, cached_image_path = self._paths(key)
+        try:
+            # The image goes first: `get` treats a post as cached once its JSON exists.
+            with open(image_path, "rb") as src:
+                self._write_atomic(cached_image_path, lambda f: shutil.copyfileobj(src, f))
+            self._write_atomic(json_path, lambda f: f.write(json.dumps(content_data).encode("utf-8")))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"   - ⚠️ Could not write post package cache: {e}")
+            return None
+        self._prune()
+        return cached_image_path
+
+    def _prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.path) if entry.name.endswith(".json")]
+            entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in entries[self.max_entries:]:
+                for path in self._paths(entry.name[:-len(".json")]):
+                    if os.path.exists(path):
+                        os.remove(path)
+        except OSError as e:
+            print(f"   - ⚠️ Could not prune post package cache: {e}")
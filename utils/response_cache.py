@@ -0,0 +1,77 @@
+# src/utils/response_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class ResponseCache:
+    """
+    Two-level cache for LLM responses: an in-memory LRU in front of an on-disk
+    SQLite table, so identical prompts are answered without an API call, even
+    across restarts. Entries expire after `ttl_seconds` and are deleted from
+    disk on the next write, so the file doesn't grow without bound.
+    """
+    def __init__(self, path: str, max_entries: int = 1024, ttl_seconds: float = 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # One connection for the cache's lifetime; the astrology fan-out calls in from many
+        # threads, and each statement is quick, so a lock around it is cheap.
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        normalized = "|".join(" ".join(part.split()) for part in parts)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(f"{self.path}.sqlite3", check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created_at REAL NOT NULL, value TEXT NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+            self._db = db
+        return self._db
+
+    def _is_fresh(self, entry) -> bool:
+        return entry is not None and time.time() - entry[0] < self.ttl_seconds
+
+    def _remember(self, key: str, entry: tuple[float, str]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if self._is_fresh(entry):
+                self._memory.move_to_end(key)
+                return entry[1]
+            try:
+                entry = self._connection().execute(
+                    "SELECT created_at, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"   - ⚠️ Could not read response cache: {e}")
+                return None
+            if not self._is_fresh(entry):
+                return None
+            self._remember(key, entry)
+            return entry[1]
+
+    def set(self, key: str, value: str):
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+            try:
+                db = self._connection()
+                db.execute("INSERT OR REPLACE INTO responses (key, created_at, value) VALUES (?, ?, ?)", (key, *entry))
+                db.execute("DELETE FROM responses WHERE created_at < ?", (entry[0] - self.ttl_seconds,))
+            except sqlite3.Error as e:
+                print(f"   - ⚠️ Could not write response cache: {e}")
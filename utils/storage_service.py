@@ -1,33 +1,53 @@
 # src/utils/storage_service.py
 import boto3
-import os
+import time
+import itertools
+import threading
+import functools
+from datetime import date
 from botocore.exceptions import NoCredentialsError, ClientError
-
-# --- Configuration is loaded at the module level ---
-SPACES_KEY = os.getenv("DO_SPACES_KEY")
-SPACES_SECRET = os.getenv("DO_SPACES_SECRET")
-SPACES_NAME = os.getenv("DO_SPACES_NAME")
-SPACES_REGION = os.getenv("DO_SPACES_REGION")
-SPACES_ENDPOINT_URL = os.getenv("DO_SPACES_ENDPOINT_URL")
+from config import settings
 
 _client = None
+# The first uploads arrive from many worker threads at once (astrology signs, Stability images).
+_client_lock = threading.Lock()
+_object_sequence = itertools.count()
+
+@functools.lru_cache(maxsize=1)
+def _date_prefix(day: date) -> str:
+    return day.strftime("%Y%m%d")
+
+def unique_object_name(folder, stem, extension):
+    """
+    Builds a collision-free object key. A nanosecond clock plus a process-wide
+    counter replaces per-second timestamps, which collide under concurrent generation.
+    """
+    return f"{folder}/{stem}_{_date_prefix(date.today())}_{time.time_ns()}_{next(_object_sequence)}.{extension}"
+
+def _public_url(object_name):
+    config = settings()
+    return f"{config.spaces_endpoint_url}/{config.spaces_name}/{object_name}"
 
 def get_client():
     """Creates and returns a boto3 client for DigitalOcean Spaces."""
     global _client
     if _client is None:
-        print("   - Creating new S3 client for Spaces...")
-        if not all([SPACES_KEY, SPACES_SECRET, SPACES_NAME, SPACES_REGION, SPACES_ENDPOINT_URL]):
-            print("   - ❌ Critical Error: Missing one or more DigitalOcean Spaces environment variables.")
-            return None
-        
-        session = boto3.session.Session()
-        _client = session.client('s3',
-                                region_name=SPACES_REGION,
-                                endpoint_url=SPACES_ENDPOINT_URL,
-                                aws_access_key_id=SPACES_KEY,
-                                aws_secret_access_key=SPACES_SECRET)
-        print("   - ✅ S3 Client created successfully.")
+        with _client_lock:
+            if _client is None:
+                print("   - Creating new S3 client for Spaces...")
+                # Read through settings() so the .env file is loaded before the credentials are.
+                config = settings()
+                if not all([config.spaces_key, config.spaces_secret, config.spaces_name, config.spaces_region, config.spaces_endpoint_url]):
+                    print("   - ❌ Critical Error: Missing one or more DigitalOcean Spaces environment variables.")
+                    return None
+                
+                session = boto3.session.Session()
+                _client = session.client('s3',
+                                        region_name=config.spaces_region,
+                                        endpoint_url=config.spaces_endpoint_url,
+                                        aws_access_key_id=config.spaces_key,
+                                        aws_secret_access_key=config.spaces_secret)
+                print("   - ✅ S3 Client created successfully.")
     return _client
 
 def upload_file(file_path, object_name):
@@ -39,7 +59,7 @@ def upload_file(file_path, object_name):
         # --- THE FIX: Add ExtraArgs to make the file public ---
         client.upload_file(
             file_path,
-            SPACES_NAME,
+            settings().spaces_name,
             object_name,
             ExtraArgs={
                 'ACL': 'public-read'
@@ -47,7 +67,7 @@ def upload_file(file_path, object_name):
         )
         print(f"   - ✅ File '{object_name}' uploaded and set to public-read.")
         # Construct the public URL
-        return f"{SPACES_ENDPOINT_URL}/{SPACES_NAME}/{object_name}"
+        return _public_url(object_name)
     except FileNotFoundError:
         print(f"   - ❌ The file to upload was not found at '{file_path}'.")
         return None
@@ -58,13 +78,32 @@ def upload_file(file_path, object_name):
         print(f"   - ❌ An unexpected error occurred during upload: {e}")
         return None
 
+def upload_bytes(data: bytes, object_name, content_type=None, public=True):
+    """Upload an in-memory payload to the configured Spaces bucket without touching local disk."""
+    client = get_client()
+    if not client: return None
+
+    extra_args = {'ACL': 'public-read'} if public else {}
+    if content_type:
+        extra_args['ContentType'] = content_type
+    try:
+        client.put_object(Bucket=settings().spaces_name, Key=object_name, Body=data, **extra_args)
+        print(f"   - ✅ In-memory payload uploaded as '{object_name}'.")
+        return _public_url(object_name)
+    except NoCredentialsError:
+        print("   - ❌ Credentials not available for Spaces authentication.")
+        return None
+    except Exception as e:
+        print(f"   - ❌ An unexpected error occurred during upload: {e}")
+        return None
+
 def get_file_content(object_name):
     """Retrieve the content of a file from Spaces."""
     client = get_client()
     if not client: return None
     
     try:
-        response = client.get_object(Bucket=SPACES_NAME, Key=object_name)
+        response = client.get_object(Bucket=settings().spaces_name, Key=object_name)
         return response['Body'].read()
     except ClientError as e:
         if e.response['Error']['Code'] == 'NoSuchKey':
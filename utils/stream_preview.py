@@ -0,0 +1,15 @@
+# src/utils/stream_preview.py
+
+class StreamPreview:
+    """
+    The streamed LLM text of one task. The worker thread appends tokens and the UI
+    reads the text; each task gets its own instance, so concurrent runs never mix.
+    """
+    def __init__(self):
+        self._tokens: list[str] = []
+
+    def append(self, token: str):
+        self._tokens.append(token)
+
+    def text(self) -> str:
+        return "".join(self._tokens)
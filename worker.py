@@ -1,16 +1,12 @@
 # worker.py
-# app.py
 import os
 import sys
 # --- THE GOLDEN FIX: Force the project root into the Python path ---
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-import streamlit as st
-from orchestration.main_orchestrator import MainOrchestrator
-
 import time
 from dotenv import load_dotenv
-from autonomous247.orchestration.main_orchestrator import MainOrchestrator
+from orchestration.main_orchestrator import MainOrchestrator
 
 def main():
     load_dotenv()